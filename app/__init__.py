@@ -4,6 +4,12 @@ Reservation API package.
 
 __version__ = "0.1.0"
 
-from app.main import app
+def __getattr__(name: str):
+    # The ASGI app is built on first access, so the worker, the outbox relay and
+    # the scripts can import app.* without loading FastAPI
+    if name == "app":
+        from app.main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ["app"] 
\ No newline at end of file
+__all__ = ["app"]
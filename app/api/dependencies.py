@@ -0,0 +1,43 @@
+from fastapi import Depends, Header, HTTPException, Request
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from typing import Optional
+import asyncio
+import os
+import secrets
+from app.database import database
+from app.database.database import get_async_sessionmaker
+from app.database.replicas import pinned_to_primary
+
+# Dependency for read-only endpoints whose results are not cached: a replica
+# session when replicas are configured and the client has not written
+# recently, the primary otherwise
+async def get_read_db(request: Request, primary: async_sessionmaker = Depends(get_async_sessionmaker)):
+    if not pinned_to_primary(request.cookies, headers=request.headers):
+        read_router = database.read_router
+        for replica in read_router.candidates():
+            db = read_router.sessionmaker(replica)()
+            try:
+                # Check out the connection now so an unreachable replica falls back
+                await db.connection()
+            except (DBAPIError, OSError, asyncio.TimeoutError) as e:
+                await db.close()
+                read_router.mark_down(replica)
+                print(f"Replica unavailable, skipping it for {read_router.retry_after}s: {str(e)}")
+                continue
+            try:
+                yield db
+            finally:
+                await db.close()
+            return
+    async with primary() as db:
+        yield db
+
+# Dependency for admin endpoints: the X-Admin-Key header must match ADMIN_API_KEY.
+# Without ADMIN_API_KEY the admin endpoints are disabled.
+def require_admin(x_admin_key: Optional[str] = Header(default=None)) -> None:
+    admin_key = os.getenv("ADMIN_API_KEY")
+    if not admin_key:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_key is None or not secrets.compare_digest(x_admin_key, admin_key):
+        raise HTTPException(status_code=403, detail="Admin key required")
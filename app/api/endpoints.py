@@ -1,78 +1,237 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from typing import List, Optional
 from datetime import date
+import base64
+import os
 
-from app.database.database import get_db
-from app.crud import crud
+from app.api.dependencies import get_read_db
+from app.database.database import get_async_db, get_async_sessionmaker
+from app.crud import async_crud
 from app.schemas import schemas
-from app.worker import celery_app
+from app.utils import bulk_io, pagination
+from app.utils.cache import cached, evict_items, get_items, invalidate_cache
+from app.utils.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
+# Longest range GET /availability/calendar accepts
+CALENDAR_MAX_DAYS = int(os.getenv("CALENDAR_MAX_DAYS", "366"))
+
+# Longest range GET /reports/occupancy accepts
+REPORT_MAX_DAYS = int(os.getenv("REPORT_MAX_DAYS", "1096"))
+
+def _send_page(response: Response, page: dict) -> list:
+    # Listings return a plain array; the cursor of the next page, if any,
+    # travels in the X-Next-Cursor header
+    if page["next_cursor"]:
+        response.headers[NEXT_CURSOR_HEADER] = page["next_cursor"]
+    return page["items"]
+
+# Page loaders, cached per namespace. The cursor is kept next to the items so
+# that cache hits can still set the X-Next-Cursor header. Cached reads use the
+# primary: a page filled from a lagging replica would be served to everyone,
+# including the client that just wrote, until it expires.
+@cached("guests", ttl=60, response_model=schemas.Page[schemas.GuestResponse], stale_ttl=30, early_refresh=1.0)
+async def _guest_page(db: AsyncSession, skip: int, limit: int, cursor: Optional[str]) -> dict:
+    after_id, filters = pagination.resolve_cursor("guests", cursor, pagination.NoFilters())
+    items = await async_crud.get_guests(db=db, skip=skip, limit=limit + 1, after_id=after_id)
+    items, next_cursor = pagination.page("guests", items, limit, filters)
+    return {"items": items, "next_cursor": next_cursor}
+
+@cached("units", ttl=60, response_model=schemas.Page[schemas.UnitResponse], stale_ttl=30, early_refresh=1.0)
+async def _unit_page(db: AsyncSession, skip: int, limit: int, cursor: Optional[str]) -> dict:
+    after_id, filters = pagination.resolve_cursor("units", cursor, pagination.NoFilters())
+    items = await async_crud.get_units(db=db, skip=skip, limit=limit + 1, after_id=after_id)
+    items, next_cursor = pagination.page("units", items, limit, filters)
+    return {"items": items, "next_cursor": next_cursor}
+
+@cached("reservations", ttl=60, response_model=schemas.Page[schemas.ReservationResponse], stale_ttl=30, early_refresh=1.0)
+async def _reservation_page(db: AsyncSession, skip: int, limit: int, cursor: Optional[str], filters: schemas.ReservationFilters) -> dict:
+    after_id, filters = pagination.resolve_cursor("reservations", cursor, filters)
+    items = await async_crud.get_reservations(db=db, skip=skip, limit=limit + 1, after_id=after_id, filters=filters)
+    items, next_cursor = pagination.page("reservations", items, limit, filters)
+    return {"items": items, "next_cursor": next_cursor}
+
+def _import_records(request: Request, format: Optional[str]):
+    fmt = bulk_io.detect_format(request.headers.get("content-type"), format)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson")
+    return bulk_io.iter_records(request.stream(), fmt)
+
 @router.post("/guests/", response_model=schemas.GuestResponse)
-def create_guest(guest: schemas.GuestCreate, db: Session = Depends(get_db)):
-    return crud.create_guest(db=db, guest=guest)
+@invalidate_cache("guests")
+async def create_guest(guest: schemas.GuestCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_guest(db=db, guest=guest)
 
 @router.get("/guests/", response_model=List[schemas.GuestResponse])
-def read_guests(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_guests(db=db, skip=skip, limit=limit)
+async def read_guests(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return _send_page(response, await _guest_page(db=db, skip=skip, limit=limit, cursor=cursor))
+
+@router.post("/guests/import", response_model=schemas.ImportResult)
+@invalidate_cache("guests")
+async def import_guests(request: Request, format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"), db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.import_guests(db=db, records=_import_records(request, format))
 
 @router.post("/units/", response_model=schemas.UnitResponse)
-def create_unit(unit: schemas.UnitCreate, db: Session = Depends(get_db)):
-    return crud.create_unit(db=db, unit=unit)
+@invalidate_cache("units")
+async def create_unit(unit: schemas.UnitCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_unit(db=db, unit=unit)
 
 @router.get("/units/", response_model=List[schemas.UnitResponse])
-def read_units(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_units(db=db, skip=skip, limit=limit)
+async def read_units(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return _send_page(response, await _unit_page(db=db, skip=skip, limit=limit, cursor=cursor))
+
+@router.post("/units/import", response_model=schemas.ImportResult)
+@invalidate_cache("units")
+async def import_units(request: Request, format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"), db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.import_units(db=db, records=_import_records(request, format))
 
 @router.post("/reservations/", response_model=schemas.ReservationResponse)
-async def create_reservation(reservation: schemas.ReservationCreate, db: Session = Depends(get_db)):
-    # Check if the unit exists
-    unit = crud.get_unit(db=db, unit_id=reservation.unit_id)
-    if not unit:
-        raise HTTPException(status_code=404, detail="Unit not found")
-    
-    # Check if the guest exists
-    guest = crud.get_guest(db=db, guest_id=reservation.guest_id)
-    if not guest:
-        raise HTTPException(status_code=404, detail="Guest not found")
-    
-    # Check for overlapping reservations
-    if crud.has_overlapping_reservation(db=db, unit_id=reservation.unit_id, 
-                                      check_in=reservation.check_in_date, 
-                                      check_out=reservation.check_out_date):
-        raise HTTPException(status_code=400, detail="Unit is already reserved for these dates")
-    
-    # Create the reservation
-    db_reservation = crud.create_reservation(db=db, reservation=reservation)
-    
-    # Send confirmation email through Celery
-    email_data = {
-        "to_email": guest.email,
-        "subject": "Reservation Confirmation",
-        "template_name": "reservation_confirmation",
-        "context": {
-            "guest_name": guest.name,
-            "unit_name": unit.name,
-            "check_in_date": reservation.check_in_date.strftime("%Y-%m-%d"),
-            "check_out_date": reservation.check_out_date.strftime("%Y-%m-%d"),
-            "reservation_id": db_reservation.id
-        }
-    }
-    
-    # Queue the email task
-    celery_app.send_task('send_reservation_email', args=[email_data])
+@invalidate_cache("reservations")
+async def create_reservation(reservation: schemas.ReservationCreate, db: AsyncSession = Depends(get_async_db)):
+    # One statement checks the guest, unit and dates, inserts the reservation
+    # and queues its email; a missing guest or unit is a 404, an overlap a 400
+    return await async_crud.create_reservation(db=db, reservation=reservation)
+
+@router.post("/reservations/bulk", response_model=schemas.BulkReservationResponse)
+@invalidate_cache("reservations")
+async def create_reservations_bulk(bulk: schemas.BulkReservationCreate, response: Response, db: AsyncSession = Depends(get_async_db)):
+    results, created = await async_crud.create_reservations_bulk(
+        db=db, reservations=bulk.reservations, all_or_nothing=bulk.mode == "all_or_nothing"
+    )
     
-    return db_reservation
+    rejected = sum(1 for result in results if result["status"] == "rejected")
+    if bulk.mode == "all_or_nothing" and rejected:
+        response.status_code = 400
+    return {"created": len(created), "rejected": rejected, "results": results}
+
+async def _reservations_by_id(db: AsyncSession, reservation_ids: List[int]) -> dict:
+    # One MGET for cached reservations, one IN query and one pipeline for the rest
+    return await get_items(
+        "reservation", reservation_ids,
+        lambda missing: async_crud.get_reservations_by_ids(db=db, reservation_ids=missing),
+        ttl=300, response_model=schemas.ReservationResponse
+    )
 
 @router.get("/reservations/", response_model=List[schemas.ReservationResponse])
-def read_reservations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_reservations(db=db, skip=skip, limit=limit)
+@router.get("/reservations", response_model=List[schemas.ReservationResponse], include_in_schema=False)
+async def read_reservations(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    ids: Optional[str] = Query(None, pattern=r"^\d+(,\d+)*$", description="Comma-separated ids; disables paging and filters"),
+    filters: schemas.ReservationFilters = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if ids is not None:
+        reservation_ids = list(dict.fromkeys(int(i) for i in ids.split(",")))
+        if len(reservation_ids) > MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} ids can be requested at once")
+        found = await _reservations_by_id(db, reservation_ids)
+        return [found[reservation_id] for reservation_id in reservation_ids if reservation_id in found]
+    return _send_page(response, await _reservation_page(db=db, skip=skip, limit=limit, cursor=cursor, filters=filters))
+
+@router.get("/reservations/export")
+async def export_reservations(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    filters: schemas.ReservationFilters = Depends(),
+    session_factory: async_sessionmaker = Depends(get_async_sessionmaker)
+):
+    batches = async_crud.stream_reservations(session_factory=session_factory, filters=filters)
+    body = bulk_io.encode_records(batches, format, async_crud.EXPORT_COLUMNS)
+    filename = f"reservations.{format}"
+    media_type = bulk_io.MEDIA_TYPES[format]
+    if gzip:
+        body = bulk_io.gzip_chunks(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@router.get("/reservations/{reservation_id}", response_model=schemas.ReservationResponse)
+async def read_reservation(reservation_id: int, db: AsyncSession = Depends(get_async_db)):
+    found = await _reservations_by_id(db, [reservation_id])
+    if reservation_id not in found:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return found[reservation_id]
 
 @router.put("/reservations/{reservation_id}", response_model=schemas.ReservationResponse)
-def update_reservation(reservation_id: int, reservation_update: schemas.ReservationUpdate, db: Session = Depends(get_db)):
+@invalidate_cache("reservations")
+async def update_reservation(reservation_id: int, reservation_update: schemas.ReservationUpdate, db: AsyncSession = Depends(get_async_db)):
     try:
-        return crud.update_reservation(db=db, reservation_id=reservation_id, reservation_update=reservation_update)
+        db_reservation = await async_crud.update_reservation(db=db, reservation_id=reservation_id, reservation_update=reservation_update)
     except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+    await evict_items("reservation", [reservation_id])
+    return db_reservation
+
+@router.get("/availability/calendar", response_model=schemas.AvailabilityCalendarResponse)
+async def read_availability_calendar(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    unit_ids: Optional[str] = Query(None, pattern=r"^\d+(,\d+)*$", description="Comma-separated unit ids; defaults to every bookable unit"),
+    db: AsyncSession = Depends(get_read_db),
+    session_factory: async_sessionmaker = Depends(get_async_sessionmaker)
+):
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="to must not be before from")
+    days = (to_date - from_date).days + 1
+    if days > CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must not exceed {CALENDAR_MAX_DAYS} days")
+    
+    requested = list(dict.fromkeys(int(unit_id) for unit_id in unit_ids.split(","))) if unit_ids else None
+    ids, occupancy = await async_crud.get_availability_calendar(
+        db=db, session_factory=session_factory, first=from_date, days=days, unit_ids=requested
+    )
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "days": days,
+        "unit_ids": ids,
+        "bytes_per_unit": -(-days // 8),
+        "occupancy": base64.b64encode(occupancy).decode()
+    }
+
+@router.get("/availability", response_model=schemas.AvailabilityResponse)
+async def read_availability(
+    check_in: date,
+    check_out: date,
+    capacity: int = Query(1, ge=1),
+    db: AsyncSession = Depends(get_read_db),
+    session_factory: async_sessionmaker = Depends(get_async_sessionmaker)
+):
+    if check_out < check_in:
+        raise HTTPException(status_code=400, detail="check_out must not be before check_in")
+    
+    unit_ids = await async_crud.get_available_units(db=db, session_factory=session_factory, check_in=check_in, check_out=check_out, capacity=capacity)
+    return {"check_in": check_in, "check_out": check_out, "capacity": capacity, "unit_ids": unit_ids}
+
+@router.get("/reports/occupancy", response_model=schemas.OccupancyReportResponse)
+async def read_occupancy_report(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    group_by: str = Query("unit", pattern="^(unit|day|month)$"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="to must not be before from")
+    if (to_date - from_date).days + 1 > REPORT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must not exceed {REPORT_MAX_DAYS} days")
+    
+    rows = await async_crud.get_occupancy_report(db=db, first=from_date, last=to_date, group_by=group_by)
+    return {"from_date": from_date, "to_date": to_date, "group_by": group_by, "rows": rows}
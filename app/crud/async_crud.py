@@ -0,0 +1,586 @@
+import asyncio
+from pydantic import ValidationError
+from sqlalchemy import Date, Integer, column, func, insert, select, text, values
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from datetime import date, timedelta
+from app.crud.crud import (
+    _queue_occupancy_refresh, _stay, cancel_reservation_statement, cancellation_email, check_dates, enqueue_task,
+    insert_reservation_statement, keyset, reservation_conditions, reservation_email, reservation_from_row,
+    update_reservation_statement
+)
+from app.database.instrumentation import db_operation
+from app.models import models
+from app.schemas import schemas
+from app.utils.availability import availability_index, build_bitmap
+from app.utils.errors import DuplicateGuestError, OverlappingReservationError, is_exclusion_violation
+
+# Async counterparts of app.crud.crud, used by the API endpoints so that
+# database round trips never block the event loop.
+
+def _confirmation_email(db_reservation: models.Reservation, guest: models.Guest, unit: models.Unit) -> dict:
+    return reservation_email(
+        "Reservation Confirmation", "reservation_confirmation", db_reservation, guest.name, guest.email, unit.name
+    )
+
+def _index_reservation(db_reservation: models.Reservation) -> None:
+    availability_index.upsert_reservation(
+        db_reservation.id, db_reservation.unit_id,
+        db_reservation.check_in_date, db_reservation.check_out_date,
+        db_reservation.status
+    )
+
+# Guest CRUD operations
+@db_operation
+async def create_guest(db: AsyncSession, guest: schemas.GuestCreate) -> models.Guest:
+    try:
+        db_guest = await db.scalar(insert(models.Guest).values(**guest.model_dump()).returning(models.Guest))
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise DuplicateGuestError(guest.email) from e
+    return db_guest
+
+@db_operation
+async def get_guests(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[models.Guest]:
+    query = keyset(select(models.Guest), models.Guest, skip, limit, after_id)
+    return list(await db.scalars(query))
+
+@db_operation
+async def get_guest(db: AsyncSession, guest_id: int) -> Optional[models.Guest]:
+    return await db.scalar(select(models.Guest).where(models.Guest.id == guest_id))
+
+# Unit CRUD operations
+@db_operation
+async def create_unit(db: AsyncSession, unit: schemas.UnitCreate) -> models.Unit:
+    db_unit = await db.scalar(insert(models.Unit).values(**unit.model_dump()).returning(models.Unit))
+    await db.commit()
+    availability_index.upsert_unit(db_unit.id, db_unit.capacity, db_unit.is_available)
+    return db_unit
+
+@db_operation
+async def get_units(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[models.Unit]:
+    query = keyset(select(models.Unit), models.Unit, skip, limit, after_id)
+    return list(await db.scalars(query))
+
+@db_operation
+async def get_unit(db: AsyncSession, unit_id: int) -> Optional[models.Unit]:
+    return await db.scalar(select(models.Unit).where(models.Unit.id == unit_id))
+
+# Reservation CRUD operations
+@db_operation
+async def has_overlapping_reservation(db: AsyncSession, unit_id: int, check_in: date, check_out: date, exclude_reservation_id: Optional[int] = None) -> bool:
+    query = select(models.Reservation.id).where(
+        models.Reservation.unit_id == unit_id,
+        models.Reservation.status == "active",
+        # Check for any overlap in the date ranges
+        models.Reservation.check_in_date <= check_out,
+        models.Reservation.check_out_date >= check_in
+    )
+
+    if exclude_reservation_id:
+        query = query.where(models.Reservation.id != exclude_reservation_id)
+
+    return await db.scalar(query.limit(1)) is not None
+
+T = TypeVar("T")
+
+async def _write_reservation(db: AsyncSession, unit_id: int, write: Callable[[], Awaitable[T]]) -> T:
+    """Async counterpart of crud._write_reservation."""
+    try:
+        result = await write()
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if is_exclusion_violation(e):
+            raise OverlappingReservationError(unit_id) from e
+        raise
+    except Exception:
+        await db.rollback()
+        raise
+    return result
+
+@db_operation
+async def create_reservation(db: AsyncSession, reservation: schemas.ReservationCreate) -> models.Reservation:
+    """Validate, insert and queue the follow-up tasks in one round trip, then commit.
+
+    Raises UnitNotFoundError, GuestNotFoundError or
+    OverlappingReservationError; all three are ValueErrors.
+    """
+    async def write():
+        return reservation_from_row((await db.execute(insert_reservation_statement(reservation))).one(), reservation)
+
+    db_reservation = await _write_reservation(db, reservation.unit_id, write)
+    _index_reservation(db_reservation)
+    return db_reservation
+
+async def _find_bulk_conflicts(db: AsyncSession, items: List[Tuple[int, schemas.ReservationCreate]]) -> Dict[int, Tuple[bool, List[int]]]:
+    """Check a batch against the database and against itself in one query.
+
+    Returns, per batch index, whether an active reservation already overlaps
+    the item and the indexes of earlier batch items that overlap it.
+    """
+    batch = select(
+        values(
+            column("idx", Integer), column("unit_id", Integer),
+            column("check_in", Date), column("check_out", Date),
+            name="batch_rows"
+        ).data([
+            (idx, item.unit_id, item.check_in_date, item.check_out_date)
+            for idx, item in items
+        ])
+    ).cte("batch")
+    b = batch.alias("b")
+    other = batch.alias("other")
+
+    db_conflict = select(models.Reservation.id).where(
+        models.Reservation.unit_id == b.c.unit_id,
+        models.Reservation.status == "active",
+        models.Reservation.check_in_date <= b.c.check_out,
+        models.Reservation.check_out_date >= b.c.check_in
+    ).exists()
+    earlier = select(func.array_agg(other.c.idx)).where(
+        other.c.unit_id == b.c.unit_id,
+        other.c.idx < b.c.idx,
+        other.c.check_in <= b.c.check_out,
+        other.c.check_out >= b.c.check_in
+    ).scalar_subquery()
+
+    rows = await db.execute(select(b.c.idx, db_conflict, earlier))
+    return {idx: (conflict, earlier_idxs or []) for idx, conflict, earlier_idxs in rows}
+
+# Bulk inserts that lose a race on the exclusion constraint are re-planned
+# against the committed rows this many times before giving up
+BULK_INSERT_ATTEMPTS = 3
+
+@db_operation
+async def create_reservations_bulk(
+    db: AsyncSession,
+    reservations: List[schemas.ReservationCreate],
+    all_or_nothing: bool = True
+) -> Tuple[List[dict], List[Tuple[models.Reservation, models.Guest, models.Unit]]]:
+    """Create a batch of reservations with a fixed number of round trips.
+
+    Guests and units are validated with one IN query each, conflicts are found
+    with one set-based query and accepted rows go in with one multi-row
+    INSERT. Returns a result entry per input item plus the created
+    reservations with their guest and unit.
+
+    If a concurrent commit makes the INSERT trip the exclusion constraint,
+    the batch is checked again and retried, so the per-item results always
+    reflect what was committed.
+    """
+    guest_ids = {r.guest_id for r in reservations}
+    unit_ids = {r.unit_id for r in reservations}
+
+    for _ in range(BULK_INSERT_ATTEMPTS):
+        # Reloaded on retries too: the rollback expires the loaded objects
+        guests = {g.id: g for g in await db.scalars(select(models.Guest).where(models.Guest.id.in_(guest_ids)))}
+        units = {u.id: u for u in await db.scalars(select(models.Unit).where(models.Unit.id.in_(unit_ids)))}
+
+        results = [{"index": idx, "status": "rejected", "reservation": None, "error": None} for idx in range(len(reservations))]
+        candidates = []
+        for idx, item in enumerate(reservations):
+            if item.unit_id not in units:
+                results[idx]["error"] = "Unit not found"
+            elif item.guest_id not in guests:
+                results[idx]["error"] = "Guest not found"
+            else:
+                candidates.append((idx, item))
+
+        accepted = []
+        conflicts = await _find_bulk_conflicts(db, candidates) if candidates else {}
+        accepted_idxs = set()
+        for idx, item in candidates:
+            db_conflict, earlier = conflicts[idx]
+            if db_conflict:
+                results[idx]["error"] = "Unit is already reserved for these dates"
+            elif accepted_idxs.intersection(earlier):
+                results[idx]["error"] = "Overlaps an earlier reservation in the same batch"
+            else:
+                accepted_idxs.add(idx)
+                accepted.append((idx, item))
+
+        if not accepted or (all_or_nothing and len(accepted) < len(reservations)):
+            for idx, _ in accepted:
+                results[idx].update(status="skipped", error="Batch was not applied")
+            return results, []
+
+        try:
+            created_rows = list(await db.scalars(
+                insert(models.Reservation).returning(models.Reservation, sort_by_parameter_order=True),
+                [item.model_dump() for _, item in accepted]
+            ))
+            # One task for the whole batch instead of one per reservation
+            enqueue_task(db, "send_reservation_emails", [[
+                _confirmation_email(db_reservation, guests[item.guest_id], units[item.unit_id])
+                for (_, item), db_reservation in zip(accepted, created_rows)
+            ]])
+            _queue_occupancy_refresh(db, [_stay(db_reservation) for db_reservation in created_rows])
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            if not is_exclusion_violation(e):
+                raise
+            # The next attempt sees the reservation that won the race
+            continue
+
+        created = []
+        for (idx, item), db_reservation in zip(accepted, created_rows):
+            _index_reservation(db_reservation)
+            results[idx].update(status="created", reservation=db_reservation)
+            created.append((db_reservation, guests[item.guest_id], units[item.unit_id]))
+        return results, created
+
+    # Still losing races: report the accepted items as rejected instead of
+    # failing the whole request
+    for idx, _ in accepted:
+        results[idx]["error"] = "Unit is already reserved for these dates"
+    return results, []
+
+@db_operation
+async def get_reservations(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    filters: Optional[schemas.ReservationFilters] = None
+) -> List[models.Reservation]:
+    query = select(models.Reservation).where(*reservation_conditions(filters))
+    query = keyset(query, models.Reservation, skip, limit, after_id)
+    return list(await db.scalars(query))
+
+EXPORT_COLUMNS = ["id", "guest_id", "unit_id", "check_in_date", "check_out_date", "status", "created_at"]
+
+async def stream_reservations(
+    session_factory: async_sessionmaker,
+    filters: Optional[schemas.ReservationFilters] = None,
+    batch_size: int = 1000
+) -> AsyncIterator[List[dict]]:
+    """Yield reservations in id order, ``batch_size`` rows at a time.
+
+    Rows come from a server-side cursor, so memory stays flat however many
+    reservations match. The generator owns its session because it keeps
+    running after the request handler has returned.
+    """
+    query = (
+        select(*(getattr(models.Reservation, name) for name in EXPORT_COLUMNS))
+        .where(*reservation_conditions(filters))
+        .order_by(models.Reservation.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async with session_factory() as db:
+        result = await db.stream(query)
+        async for partition in result.partitions():
+            yield [row._asdict() for row in partition]
+
+@db_operation
+async def get_reservation(db: AsyncSession, reservation_id: int) -> Optional[models.Reservation]:
+    return await db.scalar(select(models.Reservation).where(models.Reservation.id == reservation_id))
+
+@db_operation
+async def get_reservations_by_ids(db: AsyncSession, reservation_ids: List[int]) -> List[models.Reservation]:
+    return list(await db.scalars(select(models.Reservation).where(models.Reservation.id.in_(reservation_ids))))
+
+@db_operation
+async def update_reservation(db: AsyncSession, reservation_id: int, reservation_update: schemas.ReservationUpdate) -> models.Reservation:
+    db_reservation = await get_reservation(db, reservation_id)
+    if not db_reservation:
+        raise ValueError("Reservation not found")
+
+    # Get the values to update
+    update_data = reservation_update.model_dump(exclude_unset=True)
+    check_dates(
+        update_data.get('check_in_date', db_reservation.check_in_date),
+        update_data.get('check_out_date', db_reservation.check_out_date)
+    )
+
+    # The rollup is refreshed for the old and the new stay
+    before = _stay(db_reservation)
+
+    async def write():
+        if await db.scalar(update_reservation_statement(reservation_id, update_data)) is None:
+            if 'guest_id' in update_data and not await get_guest(db, update_data['guest_id']):
+                raise ValueError("Guest not found")
+            if 'unit_id' in update_data and not await get_unit(db, update_data['unit_id']):
+                raise ValueError("Unit not found")
+            raise ValueError("Reservation not found")
+        _queue_occupancy_refresh(db, [before, _stay(db_reservation)])
+
+    await _write_reservation(db, update_data.get('unit_id', db_reservation.unit_id), write)
+    _index_reservation(db_reservation)
+    return db_reservation
+
+@db_operation
+async def cancel_reservation(db: AsyncSession, reservation_id: int) -> models.Reservation:
+    # One UPDATE ... RETURNING also brings back the names the email needs
+    row = (await db.execute(cancel_reservation_statement(reservation_id))).one_or_none()
+    if row is None:
+        await db.rollback()
+        raise ValueError("Reservation not found")
+    db_reservation = row[0]
+
+    # The cancellation email goes out through the outbox once this commits
+    enqueue_task(db, "send_reservation_email", [cancellation_email(db_reservation, row.guest_name, row.guest_email, row.unit_name)])
+    _queue_occupancy_refresh(db, [_stay(db_reservation)])
+    await db.commit()
+    _index_reservation(db_reservation)
+    return db_reservation
+
+# Availability index
+@db_operation
+async def load_availability_index(db: AsyncSession) -> None:
+    """Rebuild the in-process availability index from the database.
+
+    Reservations that ended before today are left out; earlier ranges are
+    answered by ``_query_available_units`` instead.
+    """
+    horizon = date.today()
+    journal = availability_index.begin_load()
+    try:
+        units = (await db.execute(
+            select(models.Unit.id, models.Unit.capacity, models.Unit.is_available)
+        )).all()
+        reservations = (await db.execute(
+            select(
+                models.Reservation.id, models.Reservation.unit_id,
+                models.Reservation.check_in_date, models.Reservation.check_out_date
+            )
+            .where(models.Reservation.status == "active", models.Reservation.check_out_date >= horizon)
+            .order_by(models.Reservation.unit_id, models.Reservation.check_in_date)
+        )).all()
+    except Exception:
+        availability_index.abort_load(journal)
+        raise
+    availability_index.finish_load(journal, units, reservations, horizon=horizon)
+
+# The rebuild currently in flight, so that concurrent lookups share one
+_index_reload: Optional[asyncio.Task] = None
+
+async def _reload_availability_index(session_factory: async_sessionmaker) -> None:
+    async with session_factory() as db:
+        await load_availability_index(db)
+
+def _start_index_reload(session_factory: async_sessionmaker) -> asyncio.Task:
+    global _index_reload
+    reload = _index_reload
+    if reload is None or reload.done() or reload.get_loop() is not asyncio.get_running_loop():
+        reload = _index_reload = asyncio.create_task(_reload_availability_index(session_factory))
+        # A failed background rebuild is retried by the next stale lookup
+        reload.add_done_callback(lambda task: task.cancelled() or task.exception())
+    return reload
+
+async def _refresh_index(session_factory: async_sessionmaker) -> None:
+    if availability_index.is_stale():
+        reload = _start_index_reload(session_factory)
+        if not availability_index.loaded:
+            await asyncio.shield(reload)
+
+async def _query_available_units(db: AsyncSession, check_in: date, check_out: date, capacity: int) -> List[int]:
+    overlapping = select(models.Reservation.id).where(
+        models.Reservation.unit_id == models.Unit.id,
+        models.Reservation.status == "active",
+        models.Reservation.check_in_date <= check_out,
+        models.Reservation.check_out_date >= check_in
+    )
+    query = (
+        select(models.Unit.id)
+        .where(
+            models.Unit.capacity >= capacity,
+            models.Unit.is_available.isnot(False),
+            ~overlapping.exists()
+        )
+        .order_by(models.Unit.id)
+    )
+    return list(await db.scalars(query))
+
+@db_operation
+async def get_available_units(
+    db: AsyncSession,
+    session_factory: async_sessionmaker,
+    check_in: date,
+    check_out: date,
+    capacity: int = 1
+) -> List[int]:
+    """Answer from the availability index, rebuilding it at most once at a time.
+
+    A stale index keeps serving while one background task rebuilds it; only
+    a process that has never loaded the index waits for the rebuild.
+    """
+    await _refresh_index(session_factory)
+    if not availability_index.covers(check_in):
+        return await _query_available_units(db, check_in, check_out, capacity)
+    return availability_index.available_units(check_in, check_out, capacity)
+
+async def _query_calendar(db: AsyncSession, first: date, days: int, unit_ids: Optional[List[int]]) -> Tuple[List[int], bytes]:
+    last = first + timedelta(days=days - 1)
+    if unit_ids is None:
+        unit_ids = list(await db.scalars(
+            select(models.Unit.id).where(models.Unit.is_available.isnot(False)).order_by(models.Unit.id)
+        ))
+    rows = await db.execute(
+        select(models.Reservation.unit_id, models.Reservation.check_in_date, models.Reservation.check_out_date)
+        .where(
+            models.Reservation.unit_id.in_(unit_ids),
+            models.Reservation.status == "active",
+            models.Reservation.check_in_date <= last,
+            models.Reservation.check_out_date >= first
+        )
+    )
+    by_unit: Dict[int, List[Tuple[date, date]]] = {}
+    for unit_id, check_in, check_out in rows:
+        by_unit.setdefault(unit_id, []).append((check_in, check_out))
+    return unit_ids, b"".join(build_bitmap(first, by_unit.get(unit_id, ())).window(first, days) for unit_id in unit_ids)
+
+@db_operation
+async def get_availability_calendar(
+    db: AsyncSession,
+    session_factory: async_sessionmaker,
+    first: date,
+    days: int,
+    unit_ids: Optional[List[int]] = None
+) -> Tuple[List[int], bytes]:
+    """Booked-day bitmaps of ``days`` days from ``first`` (see AvailabilityIndex.calendar)."""
+    await _refresh_index(session_factory)
+    if not availability_index.covers(first):
+        return await _query_calendar(db, first, days, unit_ids)
+    return availability_index.calendar(first, days, unit_ids)
+
+# Occupancy reports
+def _occupancy_row(key: str, booked_days: int, available_days: int) -> dict:
+    return {
+        "key": key,
+        "booked_days": booked_days,
+        "available_days": available_days,
+        "occupancy": round(booked_days / available_days, 4) if available_days else 0.0
+    }
+
+@db_operation
+async def get_occupancy_report(db: AsyncSession, first: date, last: date, group_by: str) -> List[dict]:
+    """Booked days from the unit_day_occupancy rollup, grouped by unit, day or month.
+
+    Every bookable unit, day or month in the range gets a row, booked or not.
+    """
+    occupancy = models.UnitDayOccupancy
+    in_range = (occupancy.day >= first, occupancy.day <= last)
+    days = (last - first).days + 1
+    units = list(await db.scalars(
+        select(models.Unit.id).where(models.Unit.is_available.isnot(False)).order_by(models.Unit.id)
+    ))
+
+    if group_by == "unit":
+        booked = dict((await db.execute(
+            select(occupancy.unit_id, func.count()).where(*in_range).group_by(occupancy.unit_id)
+        )).all())
+        return [_occupancy_row(str(unit_id), booked.get(unit_id, 0), days) for unit_id in units]
+
+    # Rows of units that are no longer bookable still count as booked days
+    bucket = occupancy.day if group_by == "day" else func.to_char(occupancy.day, "YYYY-MM")
+    booked = {
+        (key.isoformat() if group_by == "day" else key): count
+        for key, count in await db.execute(select(bucket, func.count()).where(*in_range).group_by(bucket))
+    }
+    periods: Dict[str, int] = {}
+    for offset in range(days):
+        day = first + timedelta(days=offset)
+        key = day.isoformat() if group_by == "day" else day.strftime("%Y-%m")
+        periods[key] = periods.get(key, 0) + 1
+    return [_occupancy_row(key, booked.get(key, 0), period_days * len(units)) for key, period_days in periods.items()]
+
+# Streaming imports
+GUEST_IMPORT_MERGE = """
+WITH upserted AS (
+    INSERT INTO guests (name, email, phone)
+    SELECT DISTINCT ON (email) name, email, phone
+    FROM guests_import
+    ORDER BY email, line_no DESC
+    ON CONFLICT (email) DO UPDATE SET name = EXCLUDED.name, phone = EXCLUDED.phone
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+"""
+
+UNIT_IMPORT_MERGE = """
+WITH upserted AS (
+    INSERT INTO units (name, description, capacity, is_available)
+    SELECT DISTINCT ON (name) name, description, capacity, true
+    FROM units_import
+    ORDER BY name, line_no DESC
+    ON CONFLICT (name) DO UPDATE SET description = EXCLUDED.description, capacity = EXCLUDED.capacity
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+"""
+
+def _guest_import_row(record: dict) -> Optional[tuple]:
+    try:
+        guest = schemas.GuestCreate(**record)
+    except (TypeError, ValidationError):
+        return None
+    if not guest.name.strip() or not guest.email.strip():
+        return None
+    return (guest.name.strip(), guest.email.strip(), guest.phone.strip())
+
+def _unit_import_row(record: dict) -> Optional[tuple]:
+    try:
+        unit = schemas.UnitCreate(**record)
+    except (TypeError, ValidationError):
+        return None
+    if not unit.name.strip() or unit.capacity < 1:
+        return None
+    return (unit.name.strip(), unit.description, unit.capacity)
+
+async def _copy_and_merge(
+    db: AsyncSession,
+    staging_table: str,
+    staging_columns: str,
+    columns: List[str],
+    records: AsyncIterator[Optional[dict]],
+    to_row: Callable[[dict], Optional[tuple]],
+    merge_sql: str
+) -> Dict[str, int]:
+    """COPY streamed records into a temporary table and merge them in one statement.
+
+    Records are validated one at a time as asyncpg pulls them, so memory use
+    does not depend on the size of the upload. Later rows win over earlier
+    rows with the same key; the duplicates are reported as rejected.
+    """
+    counts = {"staged": 0, "rejected": 0}
+
+    async def rows():
+        async for record in records:
+            row = to_row(record) if record is not None else None
+            if row is None:
+                counts["rejected"] += 1
+                continue
+            counts["staged"] += 1
+            yield (counts["staged"], *row)
+
+    await db.execute(text(f"CREATE TEMP TABLE {staging_table} (line_no integer, {staging_columns}) ON COMMIT DROP"))
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        staging_table, records=rows(), columns=["line_no", *columns]
+    )
+    inserted, updated = (await db.execute(text(merge_sql))).one()
+    await db.commit()
+
+    duplicates = counts["staged"] - inserted - updated
+    return {"inserted": inserted, "updated": updated, "rejected": counts["rejected"] + duplicates}
+
+@db_operation
+async def import_guests(db: AsyncSession, records: AsyncIterator[Optional[dict]]) -> Dict[str, int]:
+    return await _copy_and_merge(
+        db, "guests_import", "name text, email text, phone text",
+        ["name", "email", "phone"], records, _guest_import_row, GUEST_IMPORT_MERGE
+    )
+
+@db_operation
+async def import_units(db: AsyncSession, records: AsyncIterator[Optional[dict]]) -> Dict[str, int]:
+    result = await _copy_and_merge(
+        db, "units_import", "name text, description text, capacity integer",
+        ["name", "description", "capacity"], records, _unit_import_row, UNIT_IMPORT_MERGE
+    )
+    availability_index.mark_stale()
+    return result
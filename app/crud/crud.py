@@ -1,39 +1,244 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import Date, Text, cast, exists, func, insert, literal, select, true, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from typing import Callable, List, Optional, TypeVar
 from datetime import date
 from app.models import models
+from app.database.instrumentation import db_operation
 from app.schemas import schemas
-from app.email.email_service import EmailService
+from app.utils.availability import availability_index
+from app.utils.errors import (
+    DuplicateGuestError, GuestNotFoundError, OverlappingReservationError, UnitNotFoundError, is_exclusion_violation
+)
+
+def _index_reservation(db_reservation: models.Reservation):
+    availability_index.upsert_reservation(
+        db_reservation.id, db_reservation.unit_id,
+        db_reservation.check_in_date, db_reservation.check_out_date,
+        db_reservation.status
+    )
+
+def enqueue_task(db, task_name: str, args: list) -> None:
+    """Add a Celery task to the outbox; it is published only if ``db`` commits.
+
+    ``db`` is a Session or an AsyncSession.
+    """
+    db.add(models.OutboxMessage(task_name=task_name, args=args))
+
+def _stay(db_reservation: models.Reservation) -> list:
+    return [db_reservation.unit_id, db_reservation.check_in_date.isoformat(), db_reservation.check_out_date.isoformat()]
+
+def _queue_occupancy_refresh(db, stays: List[list]) -> None:
+    # The worker recomputes these (unit_id, first day, last day) ranges of the
+    # occupancy rollup, so a redelivered task is harmless
+    enqueue_task(db, "refresh_occupancy", [stays])
+
+def reservation_email(subject: str, template_name: str, db_reservation: models.Reservation, guest_name: str, guest_email: str, unit_name: str) -> dict:
+    return {
+        "to_email": guest_email,
+        "subject": subject,
+        "template_name": template_name,
+        "context": {
+            "guest_name": guest_name,
+            "unit_name": unit_name,
+            "check_in_date": db_reservation.check_in_date.strftime("%Y-%m-%d"),
+            "check_out_date": db_reservation.check_out_date.strftime("%Y-%m-%d"),
+            "reservation_id": db_reservation.id
+        }
+    }
+
+def keyset(query, model, skip: int, limit: int, after_id: Optional[int]):
+    # Listings are ordered by id; a cursor continues after the last id seen,
+    # which costs the same at any depth, unlike an offset
+    if after_id is not None:
+        return query.where(model.id > after_id).order_by(model.id).limit(limit)
+    return query.order_by(model.id).offset(skip).limit(limit)
+
+def reservation_conditions(filters: Optional[schemas.ReservationFilters]) -> list:
+    if filters is None:
+        return []
+    conditions = []
+    if filters.unit_id is not None:
+        conditions.append(models.Reservation.unit_id == filters.unit_id)
+    if filters.guest_id is not None:
+        conditions.append(models.Reservation.guest_id == filters.guest_id)
+    if filters.status is not None:
+        conditions.append(models.Reservation.status == filters.status)
+    if filters.date_from is not None:
+        conditions.append(models.Reservation.check_out_date >= filters.date_from)
+    if filters.date_to is not None:
+        conditions.append(models.Reservation.check_in_date <= filters.date_to)
+    return conditions
+
+RESERVATION_COLUMNS = ("id", "guest_id", "unit_id", "check_in_date", "check_out_date", "status", "created_at")
+
+def _text(value: str):
+    # Typed so jsonb_build_object knows what it was given on every driver
+    return cast(literal(value), Text)
+
+def insert_reservation_statement(reservation: schemas.ReservationCreate):
+    """One statement that validates and inserts ``reservation``.
+
+    It returns a single row with ``guest_found``, ``unit_found`` and
+    ``overlaps``, plus the reservation columns, which are NULL unless the
+    row was inserted. The confirmation email and the occupancy refresh are
+    added to the outbox by the same statement, in the format of
+    reservation_email and _stay.
+
+    Every part of the statement sees the same snapshot, so a concurrent
+    overlapping insert is still caught by reservations_unit_dates_excl.
+    """
+    R = models.Reservation
+    check_in = literal(reservation.check_in_date, Date)
+    check_out = literal(reservation.check_out_date, Date)
+
+    guest = select(models.Guest.id, models.Guest.name, models.Guest.email).where(models.Guest.id == reservation.guest_id).cte("guest")
+    unit = select(models.Unit.id, models.Unit.name).where(models.Unit.id == reservation.unit_id).cte("unit")
+    overlap = select(R.id).where(
+        R.unit_id == reservation.unit_id,
+        R.status == "active",
+        R.check_in_date <= check_out,
+        R.check_out_date >= check_in
+    ).limit(1).cte("overlap")
+
+    inserted = (
+        insert(R)
+        .from_select(
+            ["guest_id", "unit_id", "check_in_date", "check_out_date", "status"],
+            select(guest.c.id, unit.c.id, check_in, check_out, literal("active"))
+            .select_from(guest.join(unit, true()))
+            .where(~exists(overlap.select()))
+        )
+        .returning(*(getattr(R, name) for name in RESERVATION_COLUMNS))
+        .cte("inserted")
+    )
+
+    # A one-row anchor keeps the flags when nothing was inserted
+    anchor = select(literal(1).label("one")).subquery("anchor")
+    statement = select(
+        exists(guest.select()).label("guest_found"),
+        exists(unit.select()).label("unit_found"),
+        exists(overlap.select()).label("overlaps"),
+        *(inserted.c[name] for name in RESERVATION_COLUMNS)
+    ).select_from(anchor.outerjoin(inserted, true()))
+
+    day = lambda column: func.to_char(column, _text("YYYY-MM-DD"))
+    email = func.jsonb_build_array(func.jsonb_build_object(
+        _text("to_email"), guest.c.email,
+        _text("subject"), _text("Reservation Confirmation"),
+        _text("template_name"), _text("reservation_confirmation"),
+        _text("context"), func.jsonb_build_object(
+            _text("guest_name"), guest.c.name,
+            _text("unit_name"), unit.c.name,
+            _text("check_in_date"), day(inserted.c.check_in_date),
+            _text("check_out_date"), day(inserted.c.check_out_date),
+            _text("reservation_id"), inserted.c.id
+        )
+    ))
+    stays = func.jsonb_build_array(func.jsonb_build_array(func.jsonb_build_array(
+        inserted.c.unit_id, day(inserted.c.check_in_date), day(inserted.c.check_out_date)
+    )))
+    queued = insert(models.OutboxMessage).from_select(
+        ["task_name", "args"],
+        union_all(
+            select(_text("send_reservation_email"), email).select_from(inserted).join(guest, true()).join(unit, true()),
+            select(_text("refresh_occupancy"), stays).select_from(inserted)
+        )
+    ).cte("queued")
+    # Not referenced by the result, so it has to be attached explicitly
+    return statement.add_cte(queued)
+
+def reservation_from_row(row, reservation: schemas.ReservationCreate) -> models.Reservation:
+    """The reservation inserted by ``insert_reservation_statement``, or the reason it was not."""
+    if not row.unit_found:
+        raise UnitNotFoundError(reservation.unit_id)
+    if not row.guest_found:
+        raise GuestNotFoundError(reservation.guest_id)
+    if row.id is None:
+        raise OverlappingReservationError(reservation.unit_id)
+    return models.Reservation(**{name: getattr(row, name) for name in RESERVATION_COLUMNS})
+
+def update_reservation_statement(reservation_id: int, update_data: dict):
+    """UPDATE ... RETURNING for ``update_data``.
+
+    A new guest or unit must exist for the row to be updated, so no row
+    comes back when one is missing.
+    """
+    R = models.Reservation
+    statement = update(R).where(R.id == reservation_id)
+    if "guest_id" in update_data:
+        statement = statement.where(select(models.Guest.id).where(models.Guest.id == update_data["guest_id"]).exists())
+    if "unit_id" in update_data:
+        statement = statement.where(select(models.Unit.id).where(models.Unit.id == update_data["unit_id"]).exists())
+    return statement.values(**update_data).returning(R).execution_options(populate_existing=True)
+
+def cancel_reservation_statement(reservation_id: int):
+    """UPDATE ... RETURNING that cancels a reservation.
+
+    The guest and unit names the cancellation email needs come back with it.
+    """
+    table = models.Reservation.__table__
+    cancelled = (
+        update(table)
+        .where(table.c.id == reservation_id)
+        .values(status="cancelled")
+        .returning(*table.c)
+        .cte("cancelled")
+    )
+    return (
+        select(
+            aliased(models.Reservation, cancelled),
+            models.Guest.name.label("guest_name"), models.Guest.email.label("guest_email"), models.Unit.name.label("unit_name")
+        )
+        .join_from(cancelled, models.Guest, models.Guest.id == cancelled.c.guest_id)
+        .join(models.Unit, models.Unit.id == cancelled.c.unit_id)
+        .execution_options(populate_existing=True)
+    )
+
+def cancellation_email(db_reservation: models.Reservation, guest_name: str, guest_email: str, unit_name: str) -> dict:
+    return reservation_email("Reservation Cancelled", "reservation_cancellation", db_reservation, guest_name, guest_email, unit_name)
+
+def check_dates(check_in: date, check_out: date) -> None:
+    if check_out < check_in:
+        raise ValueError("check_out_date must not be before check_in_date")
 
 # Guest CRUD operations
+@db_operation
 def create_guest(db: Session, guest: schemas.GuestCreate):
-    db_guest = models.Guest(**guest.model_dump())
-    db.add(db_guest)
-    db.commit()
-    db.refresh(db_guest)
+    try:
+        db_guest = db.scalar(insert(models.Guest).values(**guest.model_dump()).returning(models.Guest))
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise DuplicateGuestError(guest.email) from e
     return db_guest
 
-def get_guests(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Guest).offset(skip).limit(limit).all()
+@db_operation
+def get_guests(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    return keyset(db.query(models.Guest), models.Guest, skip, limit, after_id).all()
 
+@db_operation
 def get_guest(db: Session, guest_id: int):
     return db.query(models.Guest).filter(models.Guest.id == guest_id).first()
 
 # Unit CRUD operations
+@db_operation
 def create_unit(db: Session, unit: schemas.UnitCreate):
-    db_unit = models.Unit(**unit.model_dump())
-    db.add(db_unit)
+    db_unit = db.scalar(insert(models.Unit).values(**unit.model_dump()).returning(models.Unit))
     db.commit()
-    db.refresh(db_unit)
+    availability_index.upsert_unit(db_unit.id, db_unit.capacity, db_unit.is_available)
     return db_unit
 
-def get_units(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Unit).offset(skip).limit(limit).all()
+@db_operation
+def get_units(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    return keyset(db.query(models.Unit), models.Unit, skip, limit, after_id).all()
 
+@db_operation
 def get_unit(db: Session, unit_id: int):
     return db.query(models.Unit).filter(models.Unit.id == unit_id).first()
 
 # Reservation CRUD operations
+@db_operation
 def has_overlapping_reservation(db: Session, unit_id: int, check_in: date, check_out: date, exclude_reservation_id: Optional[int] = None):
     query = db.query(models.Reservation).filter(
         models.Reservation.unit_id == unit_id,
@@ -48,95 +253,88 @@ def has_overlapping_reservation(db: Session, unit_id: int, check_in: date, check
     
     return query.first() is not None
 
+T = TypeVar("T")
+
+def _write_reservation(db: Session, unit_id: int, write: Callable[[], T]) -> T:
+    """Run ``write`` and commit; any error rolls the transaction back.
+
+    An overlap rejected by the reservations_unit_dates_excl constraint,
+    which also holds for concurrent writes, becomes OverlappingReservationError.
+    """
+    try:
+        result = write()
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if is_exclusion_violation(e):
+            raise OverlappingReservationError(unit_id) from e
+        raise
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+# Writers return their rows with RETURNING and sessions do not expire on
+# commit, so nothing is read back after the COMMIT
+@db_operation
 def create_reservation(db: Session, reservation: schemas.ReservationCreate):
-    # Check if the unit exists
-    unit = db.query(models.Unit).filter(models.Unit.id == reservation.unit_id).first()
-    if not unit:
-        raise ValueError("Unit not found")
-    
-    # Check if the guest exists
-    guest = db.query(models.Guest).filter(models.Guest.id == reservation.guest_id).first()
-    if not guest:
-        raise ValueError("Guest not found")
-    
-    # Check for overlapping reservations
-    if has_overlapping_reservation(db, reservation.unit_id, reservation.check_in_date, reservation.check_out_date):
-        raise ValueError("Unit is already reserved for these dates")
-    
-    db_reservation = models.Reservation(**reservation.model_dump())
-    db.add(db_reservation)
-    db.commit()
-    db.refresh(db_reservation)
+    # Validation, the INSERT and the outbox rows are one statement
+    db_reservation = _write_reservation(
+        db, reservation.unit_id,
+        lambda: reservation_from_row(db.execute(insert_reservation_statement(reservation)).one(), reservation)
+    )
+    _index_reservation(db_reservation)
     return db_reservation
 
-def get_reservations(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Reservation).offset(skip).limit(limit).all()
+@db_operation
+def get_reservations(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None, filters: Optional[schemas.ReservationFilters] = None):
+    query = db.query(models.Reservation).filter(*reservation_conditions(filters))
+    return keyset(query, models.Reservation, skip, limit, after_id).all()
 
+@db_operation
 def get_reservation(db: Session, reservation_id: int):
     return db.query(models.Reservation).filter(models.Reservation.id == reservation_id).first()
 
+@db_operation
 def update_reservation(db: Session, reservation_id: int, reservation_update: schemas.ReservationUpdate):
-    db_reservation = db.query(models.Reservation).filter(models.Reservation.id == reservation_id).first()
+    db_reservation = get_reservation(db, reservation_id)
     if not db_reservation:
         raise ValueError("Reservation not found")
     
     # Get the values to update
     update_data = reservation_update.model_dump(exclude_unset=True)
+    check_dates(
+        update_data.get('check_in_date', db_reservation.check_in_date),
+        update_data.get('check_out_date', db_reservation.check_out_date)
+    )
     
-    # If updating dates or unit, check for overlaps
-    if any(key in update_data for key in ['check_in_date', 'check_out_date', 'unit_id']):
-        unit_id = update_data.get('unit_id', db_reservation.unit_id)
-        check_in = update_data.get('check_in_date', db_reservation.check_in_date)
-        check_out = update_data.get('check_out_date', db_reservation.check_out_date)
-        
-        if has_overlapping_reservation(db, unit_id, check_in, check_out, reservation_id):
-            raise ValueError("Unit is already reserved for these dates")
-    
-    # If updating guest_id, verify guest exists
-    if 'guest_id' in update_data:
-        guest = db.query(models.Guest).filter(models.Guest.id == update_data['guest_id']).first()
-        if not guest:
-            raise ValueError("Guest not found")
-    
-    # If updating unit_id, verify unit exists
-    if 'unit_id' in update_data:
-        unit = db.query(models.Unit).filter(models.Unit.id == update_data['unit_id']).first()
-        if not unit:
-            raise ValueError("Unit not found")
+    # The rollup is refreshed for the old and the new stay
+    before = _stay(db_reservation)
     
-    # Update the reservation
-    for key, value in update_data.items():
-        setattr(db_reservation, key, value)
+    def write():
+        if db.scalar(update_reservation_statement(reservation_id, update_data)) is None:
+            if 'guest_id' in update_data and not get_guest(db, update_data['guest_id']):
+                raise ValueError("Guest not found")
+            if 'unit_id' in update_data and not get_unit(db, update_data['unit_id']):
+                raise ValueError("Unit not found")
+            raise ValueError("Reservation not found")
+        _queue_occupancy_refresh(db, [before, _stay(db_reservation)])
     
-    db.commit()
-    db.refresh(db_reservation)
+    _write_reservation(db, update_data.get('unit_id', db_reservation.unit_id), write)
+    _index_reservation(db_reservation)
     return db_reservation
 
+@db_operation
 def cancel_reservation(db: Session, reservation_id: int):
-    db_reservation = db.query(models.Reservation).filter(models.Reservation.id == reservation_id).first()
-    if not db_reservation:
+    row = db.execute(cancel_reservation_statement(reservation_id)).one_or_none()
+    if row is None:
+        db.rollback()
         raise ValueError("Reservation not found")
+    db_reservation = row[0]
     
-    # Cambiar el estado de la reservación a "cancelada"
-    db_reservation.status = "cancelled"
-    
+    # The cancellation email goes out through the outbox once this commits
+    enqueue_task(db, "send_reservation_email", [cancellation_email(db_reservation, row.guest_name, row.guest_email, row.unit_name)])
+    _queue_occupancy_refresh(db, [_stay(db_reservation)])
     db.commit()
-    db.refresh(db_reservation)
-    
-    # Enviar correo de confirmación
-    email_service = EmailService()
-    context = {
-        "guest_name": db_reservation.guest.name,
-        "unit_name": db_reservation.unit.name,
-        "check_in_date": db_reservation.check_in_date,
-        "check_out_date": db_reservation.check_out_date,
-        "reservation_id": db_reservation.id
-    }
-    email_service.send_email(
-        to_email=db_reservation.guest.email,
-        subject="Reservation Cancelled",
-        template_name="reservation_cancellation",
-        context=context
-    )
-    
-    return db_reservation 
\ No newline at end of file
+    _index_reservation(db_reservation)
+    return db_reservation
@@ -1,3 +1,20 @@
-from app.database.database import Base, engine, get_db
+from app.database import database
+from app.database.database import (
+    Base, get_db, get_async_db, get_async_sessionmaker, dispose_engines
+)
+from app.database.migrate import upgrade_database
 
-__all__ = ["Base", "engine", "get_db"] 
\ No newline at end of file
+# Engines, session factories and the replica router are created on first access
+_LAZY_ATTRIBUTES = ("engine", "async_engine", "AsyncSessionLocal", "read_router")
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(database, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = [
+    "Base", "engine", "get_db",
+    "async_engine", "AsyncSessionLocal", "get_async_db", "get_async_sessionmaker",
+    "read_router", "dispose_engines",
+    "upgrade_database"
+]
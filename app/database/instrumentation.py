@@ -0,0 +1,143 @@
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from typing import Callable, List
+import hashlib
+import inspect
+import re
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.metrics import (
+    DB_CONNECTIONS, DB_POOL_CHECKED_OUT, DB_POOL_IDLE, DB_POOL_OVERFLOW,
+    DB_POOL_TIMEOUTS, DB_POOL_WAIT_TIME, DB_QUERY_TIME
+)
+
+# Name of the crud function running the current statement. Async sessions run
+# statements in a greenlet that shares the caller's context, so the value set
+# by the awaiting coroutine is visible to the cursor events.
+current_operation: ContextVar[str] = ContextVar("current_operation", default="other")
+
+def db_operation(func: Callable) -> Callable:
+    """Label the statements run by ``func`` with its name."""
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token = current_operation.set(func.__name__)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                current_operation.reset(token)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = current_operation.set(func.__name__)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            current_operation.reset(token)
+    return wrapper
+
+# Statement fingerprints
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMS = re.compile(r"\$\d+(?:::\w+)?|%\(\w+\)s|%s|:\w+|\?")
+_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROWS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_SPACES = re.compile(r"\s+")
+_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+\"?(\w+)", re.IGNORECASE)
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Reduce a statement to "<VERB> <table> <hash>".
+
+    Literals and bind parameters are replaced and repeated parameter lists
+    (IN lists, multi-row VALUES) are collapsed before hashing, so statements
+    that differ only in their values share one label.
+    """
+    normalized = _PARAMS.sub("?", statement)
+    normalized = _LITERALS.sub("?", normalized)
+    normalized = _LISTS.sub("?", normalized)
+    normalized = _SPACES.sub(" ", normalized).strip()
+    normalized = _ROWS.sub("(?)", normalized)
+    verb = normalized.split(" ", 1)[0].upper() if normalized else "EMPTY"
+    table = _TABLE.search(normalized)
+    digest = hashlib.sha1(normalized.encode()).hexdigest()[:8]
+    return f"{verb} {table.group(1) if table else '-'} {digest}"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    DB_QUERY_TIME.labels(query_type=fingerprint(statement), operation=current_operation.get()).observe(elapsed)
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
+
+def instrument_queries() -> None:
+    """Time every statement of every engine in this process."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+# Connection pools
+class _TimedCheckout:
+    """Times how long checkouts wait for a connection and counts timeouts.
+
+    Metrics are labelled with the class default until instrument_pool()
+    gives the engine's pool its own label.
+    """
+
+    metrics_label = "sync"
+
+    def recreate(self):
+        # dispose() swaps in a new pool, which keeps the engine's label
+        pool = super().recreate()
+        pool.metrics_label = self.metrics_label
+        return pool
+
+    def _do_get(self):
+        # _do_get is where QueuePool blocks when every connection is in use
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(pool=self.metrics_label).inc()
+            raise
+        finally:
+            DB_POOL_WAIT_TIME.labels(pool=self.metrics_label).observe(time.perf_counter() - started)
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    metrics_label = "sync"
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+def _pool_stat(engine, stat: str) -> Callable[[], float]:
+    # Read through engine.pool: dispose() replaces the pool object
+    def read() -> float:
+        pool = engine.pool
+        return getattr(pool, stat)() if isinstance(pool, QueuePool) else 0
+    return read
+
+def instrument_pool(engine, label: str) -> None:
+    """Export checked-out, overflow and idle gauges for an engine's pool and
+    label its checkout waits and timeouts with ``label``."""
+    if isinstance(engine.pool, _TimedCheckout):
+        engine.pool.metrics_label = label
+    DB_POOL_CHECKED_OUT.labels(pool=label).set_function(_pool_stat(engine, "checkedout"))
+    DB_POOL_OVERFLOW.labels(pool=label).set_function(_pool_stat(engine, "overflow"))
+    DB_POOL_IDLE.labels(pool=label).set_function(_pool_stat(engine, "checkedin"))
+
+def export_connection_total(engines: List) -> None:
+    """DB_CONNECTIONS reports connections checked out across ``engines``.
+
+    The list is read at every scrape, so engines appended later are counted.
+    """
+    DB_CONNECTIONS.set_function(lambda: sum(_pool_stat(engine, "checkedout")() for engine in engines))
@@ -0,0 +1,30 @@
+"""Schema migrations, managed by Alembic (app/database/migrations).
+
+``alembic upgrade head`` from the project root does the same as
+``upgrade_database()``, which the API runs on startup only when
+MIGRATE_ON_STARTUP is set. Alembic is imported only when a migration runs;
+it is not needed to serve requests.
+"""
+from typing import TYPE_CHECKING, Optional
+import os
+
+if TYPE_CHECKING:
+    from alembic.config import Config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+def alembic_config(url: Optional[str] = None) -> "Config":
+    """Alembic configuration for ``url``, DATABASE_URL by default."""
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    if url:
+        # ConfigParser interpolation would read a % in the password
+        config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    return config
+
+def upgrade_database(url: Optional[str] = None, revision: str = "head") -> None:
+    from alembic import command
+
+    command.upgrade(alembic_config(url), revision)
@@ -0,0 +1,47 @@
+from alembic import context
+from logging.config import fileConfig
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+import time
+from app.database.database import DATABASE_URL, Base
+from app.models import models  # noqa: F401  (registers the tables on Base.metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# API processes that start together migrate one at a time
+MIGRATION_LOCK_ID = 7202
+MIGRATION_LOCK_POLL_INTERVAL = 0.5
+
+def database_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+def run_migrations_offline() -> None:
+    context.configure(url=database_url(), target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    engine = create_engine(database_url(), poolclass=NullPool)
+    # The lock is polled from an autocommit connection: a session blocked
+    # inside pg_advisory_lock would hold a snapshot, which CREATE INDEX
+    # CONCURRENTLY in the running migration waits for
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+        while not lock.scalar(text("SELECT pg_try_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}):
+            time.sleep(MIGRATION_LOCK_POLL_INTERVAL)
+        try:
+            with engine.connect() as connection:
+                context.configure(connection=connection, target_metadata=target_metadata)
+                with context.begin_transaction():
+                    context.run_migrations()
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+    engine.dispose()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,107 @@
+"""Baseline: the schema that Base.metadata.create_all used to build.
+
+Tables are only created when missing, so a database that was set up by
+create_all before migrations existed is adopted by running this revision.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2024-06-01 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Older databases may have the reservations table without the constraint
+RESERVATION_OVERLAP_CONSTRAINT_DDL = """
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'reservations_unit_dates_excl'
+          AND conrelid = 'reservations'::regclass
+    ) THEN
+        ALTER TABLE reservations ADD CONSTRAINT reservations_unit_dates_excl
+            EXCLUDE USING gist (
+                int4range(unit_id, unit_id, '[]') WITH &&,
+                daterange(check_in_date, check_out_date, '[]') WITH &&
+            ) WHERE (status = 'active');
+    END IF;
+END
+$$
+"""
+
+def _missing(table: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+def upgrade() -> None:
+    if _missing("guests"):
+        op.create_table(
+            "guests",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(255)),
+            sa.Column("email", sa.String(255)),
+            sa.Column("phone", sa.String(50)),
+        )
+        op.create_index("ix_guests_id", "guests", ["id"])
+        op.create_index("ix_guests_name", "guests", ["name"])
+        op.create_index("ix_guests_email", "guests", ["email"], unique=True)
+
+    if _missing("units"):
+        op.create_table(
+            "units",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(255)),
+            sa.Column("description", sa.Text()),
+            sa.Column("capacity", sa.Integer()),
+            sa.Column("is_available", sa.Boolean()),
+        )
+        op.create_index("ix_units_id", "units", ["id"])
+        op.create_index("ix_units_name", "units", ["name"], unique=True)
+
+    if _missing("reservations"):
+        op.create_table(
+            "reservations",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("guest_id", sa.Integer(), sa.ForeignKey("guests.id", ondelete="CASCADE")),
+            sa.Column("unit_id", sa.Integer(), sa.ForeignKey("units.id", ondelete="CASCADE")),
+            sa.Column("check_in_date", sa.Date()),
+            sa.Column("check_out_date", sa.Date()),
+            sa.Column("status", sa.String(50)),
+            sa.Column("created_at", sa.Date(), server_default=sa.func.current_date()),
+        )
+        op.create_index("ix_reservations_id", "reservations", ["id"])
+        op.create_index("ix_reservations_check_in_date", "reservations", ["check_in_date"])
+        op.create_index("ix_reservations_check_out_date", "reservations", ["check_out_date"])
+    # Fails while overlapping active reservations exist; they have to be
+    # resolved before the constraint can be added
+    op.execute(RESERVATION_OVERLAP_CONSTRAINT_DDL)
+
+    if _missing("outbox"):
+        op.create_table(
+            "outbox",
+            sa.Column("id", sa.BigInteger(), primary_key=True),
+            sa.Column("task_name", sa.String(255), nullable=False),
+            sa.Column("args", postgresql.JSONB(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+
+    if _missing("unit_day_occupancy"):
+        op.create_table(
+            "unit_day_occupancy",
+            sa.Column("unit_id", sa.Integer(), sa.ForeignKey("units.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("reservations", sa.Integer(), nullable=False),
+        )
+        op.create_index("ix_unit_day_occupancy_day", "unit_day_occupancy", ["day"])
+
+def downgrade() -> None:
+    op.drop_table("unit_day_occupancy")
+    op.drop_table("outbox")
+    op.drop_table("reservations")
+    op.drop_table("units")
+    op.drop_table("guests")
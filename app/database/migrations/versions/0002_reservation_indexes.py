@@ -0,0 +1,36 @@
+"""Indexes for the reservation foreign keys and the overlap check.
+
+Built CONCURRENTLY so bookings keep being written while they are created.
+
+Revision ID: 0002_reservation_indexes
+Revises: 0001_baseline
+Create Date: 2024-06-01 00:00:01
+"""
+from alembic import op
+
+revision = "0002_reservation_indexes"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    # Unit and guest deletes cascade through these, and listings filter on them
+    "ix_reservations_guest_id": "reservations (guest_id)",
+    "ix_reservations_unit_id": "reservations (unit_id)",
+    # The overlap check: a unit's active stays that end on or after the new
+    # check-in. Leading with check_out_date keeps past stays out of the scan;
+    # check_in_date makes it an index-only lookup.
+    "ix_reservations_active_unit_dates": (
+        "reservations (unit_id, check_out_date, check_in_date) WHERE status = 'active'"
+    ),
+}
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
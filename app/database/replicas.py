@@ -0,0 +1,105 @@
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from typing import Dict, List, Mapping, Optional
+import itertools
+import threading
+import time
+
+# Cookie holding the time until which a client that wrote reads from the primary
+PRIMARY_PIN_COOKIE = "db_primary_until"
+# The same pin as a response header, for clients that do not keep cookies and
+# send it back on their reads instead
+PRIMARY_PIN_HEADER = "X-DB-Primary-Until"
+
+class ReplicaRouter:
+    """Chooses the replica that serves a read.
+
+    ``strategy`` is ``round_robin`` or ``least_connections`` (fewest checked
+    out connections in this process). A replica that fails to hand out a
+    connection is skipped for ``retry_after`` seconds.
+    """
+
+    def __init__(self, engines: List[AsyncEngine], strategy: str = "round_robin", retry_after: float = 30):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica strategy: {strategy}")
+        self.strategy = strategy
+        self.retry_after = retry_after
+        self.engines = engines
+        self._sessionmakers: Dict[AsyncEngine, async_sessionmaker] = {}
+        self._down_until: Dict[AsyncEngine, float] = {}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def candidates(self) -> List[AsyncEngine]:
+        """Healthy replicas, best first."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [engine for engine in self.engines if self._down_until.get(engine, 0) <= now]
+            if not healthy:
+                return []
+            if self.strategy == "least_connections":
+                return sorted(healthy, key=_checked_out)
+            start = next(self._turn) % len(healthy)
+            return healthy[start:] + healthy[:start]
+
+    def mark_down(self, engine: AsyncEngine) -> None:
+        with self._lock:
+            self._down_until[engine] = time.monotonic() + self.retry_after
+
+    def sessionmaker(self, engine: AsyncEngine) -> async_sessionmaker:
+        with self._lock:
+            factory = self._sessionmakers.get(engine)
+            if factory is None:
+                factory = self._sessionmakers[engine] = async_sessionmaker(
+                    bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+                )
+            return factory
+
+def _checked_out(engine: AsyncEngine) -> int:
+    # Pools without a count (NullPool) hold no connections between uses
+    checkedout = getattr(engine.sync_engine.pool, "checkedout", None)
+    return checkedout() if checkedout else 0
+
+def pinned_to_primary(cookies: Mapping[str, str], now: Optional[float] = None, headers: Optional[Mapping[str, str]] = None) -> bool:
+    """Whether the client wrote recently enough to read its own writes from the primary.
+
+    The pin comes from the cookie or, failing that, the request header.
+    """
+    now = now or time.time()
+    pins = [cookies.get(PRIMARY_PIN_COOKIE), headers.get(PRIMARY_PIN_HEADER) if headers is not None else None]
+    for pin in pins:
+        try:
+            if pin is not None and float(pin) > now:
+                return True
+        except ValueError:
+            pass
+    return False
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary for ``window`` seconds after a successful write.
+
+    Only applies while ``router`` has replicas. The pin travels in a cookie,
+    and in the X-DB-Primary-Until header for clients without cookies, so it
+    holds whichever API process serves the next request.
+    """
+
+    def __init__(self, app, router: ReplicaRouter, window: float = 5) -> None:
+        self.app = app
+        self.router = router
+        self.window = window
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS") or not self.router.engines or self.window <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = f"{time.time() + self.window:.3f}"
+                cookie = f"{PRIMARY_PIN_COOKIE}={until}; Max-Age={int(self.window) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode()),
+                    (PRIMARY_PIN_HEADER.lower().encode(), until.encode())
+                ])
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
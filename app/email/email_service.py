@@ -1,9 +1,38 @@
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import aiosmtplib
-from jinja2 import Template
-from typing import Dict, Any
+import asyncio
+import weakref
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, TemplateNotFound, select_autoescape
+from typing import Dict, Any, Optional, Tuple
 import os
+from app.email.smtp_pool import SMTPPool
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+# Compiled templates are kept by the environment; the bytecode cache lets a
+# fresh worker process skip compiling them again
+template_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    bytecode_cache=FileSystemBytecodeCache(os.getenv("EMAIL_TEMPLATE_CACHE_DIR") or None),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+)
+
+def precompile_templates() -> int:
+    """Compile every email template into the environment's cache."""
+    names = template_env.list_templates(extensions=["html", "txt"])
+    for name in names:
+        template_env.get_template(name)
+    return len(names)
+
+def render_email(template_name: str, context: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+    """Render the HTML body and, when ``<name>.txt`` exists, the plaintext body."""
+    html_content = template_env.get_template(f"{template_name}.html").render(**context)
+    try:
+        text_content = template_env.get_template(f"{template_name}.txt").render(**context)
+    except TemplateNotFound:
+        text_content = None
+    return html_content, text_content
 
 class EmailService:
     def __init__(self):
@@ -12,16 +41,37 @@ class EmailService:
         self.smtp_user = os.getenv("SMTP_USER", "")
         self.smtp_password = os.getenv("SMTP_PASSWORD", "")
         self.from_email = os.getenv("FROM_EMAIL", "reservations@example.com")
+        self.pool_size = int(os.getenv("SMTP_POOL_SIZE", "5"))
+        self.rate_limit = float(os.getenv("SMTP_RATE_LIMIT", "0"))
+        self.max_messages_per_connection = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+        # SMTP sessions belong to the loop that opened them, so each loop gets its own pool
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SMTPPool]" = weakref.WeakKeyDictionary()
+
+    def _pool(self) -> SMTPPool:
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = self._pools[loop] = SMTPPool(
+                hostname=self.smtp_host,
+                port=self.smtp_port,
+                username=self.smtp_user or None,
+                password=self.smtp_password or None,
+                size=self.pool_size,
+                rate=self.rate_limit,
+                max_messages_per_connection=self.max_messages_per_connection,
+            )
+        return pool
+
+    async def close(self):
+        """Quit the SMTP sessions opened on the running loop."""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.close()
 
     async def send_email(self, to_email: str, subject: str, template_name: str, context: Dict[str, Any]):
         """Send an email using a template."""
-        # Load email template
-        template_path = os.path.join(os.path.dirname(__file__), "templates", f"{template_name}.html")
-        with open(template_path, "r") as f:
-            template = Template(f.read())
-        
         # Render template with context
-        html_content = template.render(**context)
+        html_content, text_content = render_email(template_name, context)
 
         # Create message
         message = MIMEMultipart("alternative")
@@ -29,15 +79,10 @@ class EmailService:
         message["To"] = to_email
         message["Subject"] = subject
 
-        # Attach HTML content
+        # Attach content; clients show the last alternative they support
+        if text_content is not None:
+            message.attach(MIMEText(text_content, "plain"))
         message.attach(MIMEText(html_content, "html"))
 
-        # Send email
-        await aiosmtplib.send(
-            message,
-            hostname=self.smtp_host,
-            port=self.smtp_port,
-            username=self.smtp_user,
-            password=self.smtp_password,
-            use_tls=False
-        ) 
\ No newline at end of file
+        # Send email over a pooled session
+        await self._pool().send(message) 
\ No newline at end of file
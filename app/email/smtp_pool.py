@@ -0,0 +1,136 @@
+from email.message import Message
+from typing import List, Optional
+import asyncio
+import time
+import aiosmtplib
+
+# Errors after which a session cannot be trusted and is reopened
+_CONNECTION_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError, asyncio.TimeoutError)
+
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second on average, bursting to ``burst``.
+
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        # Waiters queue on the lock so tokens go out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class SMTPPool:
+    """Persistent SMTP sessions shared by the sends running on one event loop.
+
+    At most ``size`` sessions are open and each sends up to
+    ``max_messages_per_connection`` messages before it is recycled. A session
+    that fails with a connection error is discarded and the message is retried
+    once on a new one.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        size: int = 5,
+        rate: float = 0,
+        max_messages_per_connection: int = 100,
+        timeout: float = 30,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate)
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._sent = {}
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=False,
+            timeout=self.timeout,
+        )
+        await client.connect()
+        self._sent[client] = 0
+        return client
+
+    async def _checkout(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            client = self._idle.pop()
+            if client.is_connected:
+                return client
+            self._discard(client)
+        return await self._connect()
+
+    def _discard(self, client: aiosmtplib.SMTP) -> None:
+        self._sent.pop(client, None)
+        client.close()
+
+    async def _checkin(self, client: aiosmtplib.SMTP) -> None:
+        if self._sent.get(client, 0) < self.max_messages_per_connection and client.is_connected:
+            self._idle.append(client)
+            return
+        try:
+            await client.quit()
+        except aiosmtplib.SMTPException:
+            pass
+        self._discard(client)
+
+    async def send(self, message: Message) -> None:
+        """Send ``message`` over a pooled session."""
+        await self.bucket.acquire()
+        async with self._slots:
+            for attempt in range(2):
+                client = await self._checkout()
+                try:
+                    await client.send_message(message)
+                except _CONNECTION_ERRORS:
+                    self._discard(client)
+                    if attempt:
+                        raise
+                    continue
+                except aiosmtplib.SMTPException:
+                    # The server refused this message; the session is still usable
+                    try:
+                        await client.rset()
+                        await self._checkin(client)
+                    except (aiosmtplib.SMTPException, *_CONNECTION_ERRORS):
+                        self._discard(client)
+                    raise
+                self._sent[client] += 1
+                await self._checkin(client)
+                return
+
+    async def close(self) -> None:
+        """Quit every idle session."""
+        idle, self._idle = self._idle, []
+        for client in idle:
+            try:
+                await client.quit()
+            except aiosmtplib.SMTPException:
+                pass
+            self._discard(client)
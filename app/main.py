@@ -1,59 +1,104 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.endpoints import router
-from app.database.database import engine, Base
-from app.email.email_service import EmailService
-from app.worker import celery_app
-from app.metrics import metrics_middleware
+from app.routers import admin_routes
+from app.database import database
+from app.database.database import READ_YOUR_WRITES_SECONDS, dispose_engines
+from app.database.migrate import upgrade_database
+from app.database.replicas import PRIMARY_PIN_HEADER, ReadYourWritesMiddleware
+from sqlalchemy.exc import IntegrityError
+from app.crud import async_crud
+from app.metrics import MetricsMiddleware
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils import cache
+import asyncio
 import os
-from prometheus_client import make_asgi_app
+from contextlib import asynccontextmanager
 from fastapi.responses import PlainTextResponse, JSONResponse
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
-# Create database tables
-try:
-    Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully")
-except Exception as e:
-    print(f"Error creating database tables: {str(e)}")
-
-# Create FastAPI app
-app = FastAPI(
-    title="Reservation System API",
-    description="API for managing reservations, guests, and units",
-    version="1.0.0"
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Agregar middleware de métricas
-app.middleware("http")(metrics_middleware)
-
-# Agregar endpoint de métricas
-@app.get("/metrics", response_class=PlainTextResponse)
-async def metrics():
-    return PlainTextResponse(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing and building the app opens no connections; engines, pools and
+    # the Redis client are created here, or by the first request that needs them.
 
-# Include API routes
-app.include_router(router, prefix="/api/v1")
+    # Migrations are a deploy step (`alembic upgrade head`, the compose
+    # `migrate` service). MIGRATE_ON_STARTUP=1 runs them here instead, and a
+    # failure stops the startup rather than serving an outdated schema.
+    if os.getenv("MIGRATE_ON_STARTUP", "").lower() in ("1", "true", "yes"):
+        try:
+            await asyncio.to_thread(upgrade_database)
+        except IntegrityError as e:
+            # Reservations rely on the overlap constraint
+            raise RuntimeError(
+                "Cannot add reservations_unit_dates_excl: overlapping active reservations exist"
+            ) from e
+        print("Database migrations applied successfully")
 
-# Initialize email service
-email_service = EmailService()
+    # Warm the availability index; requests rebuild it lazily if this fails
+    try:
+        async with database.AsyncSessionLocal() as db:
+            await async_crud.load_availability_index(db)
+    except Exception as e:
+        print(f"Error loading availability index: {str(e)}")
+    cache.start_invalidation_listener()
+    yield
+    await cache.stop_invalidation_listener()
+    await cache.close_redis()
+    await dispose_engines()
+
+async def metrics():
+    return PlainTextResponse(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
-@app.get("/")
 async def root():
     return {"message": "Welcome to the Reservation System API"}
 
-@app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal Server Error", "type": str(type(exc).__name__)},
-    ) 
\ No newline at end of file
+    )
+
+def create_app() -> FastAPI:
+    """Build the API application.
+
+    Serve it with ``uvicorn app.main:create_app --factory``; ``app.main:app``
+    is an instance built at import for existing deployments.
+    """
+    app = FastAPI(
+        title="Reservation System API",
+        description="API for managing reservations, guests, and units",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, PRIMARY_PIN_HEADER],
+    )
+
+    # Clients that just wrote read from the primary until replicas catch up
+    app.add_middleware(ReadYourWritesMiddleware, router=database.read_router, window=READ_YOUR_WRITES_SECONDS)
+
+    # Agregar middleware de métricas
+    app.add_middleware(MetricsMiddleware)
+
+    # Agregar endpoint de métricas
+    app.add_api_route("/metrics", metrics, methods=["GET"], response_class=PlainTextResponse)
+
+    # Include API routes
+    app.include_router(router, prefix="/api/v1")
+
+    # Admin routes sit next to /metrics, outside the public API
+    app.include_router(admin_routes.router)
+
+    app.add_api_route("/", root, methods=["GET"])
+    app.add_exception_handler(Exception, global_exception_handler)
+    return app
+
+app = create_app()
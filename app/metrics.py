@@ -15,11 +15,24 @@ REQUEST_LATENCY = Histogram(
     ['method', 'endpoint']
 )
 
+REQUESTS_IN_PROGRESS = Gauge(
+    'reservation_api_requests_in_progress',
+    'API requests currently being served',
+    ['method']
+)
+
+RESPONSE_SIZE = Histogram(
+    'reservation_api_response_size_bytes',
+    'API response body size in bytes',
+    ['method', 'endpoint'],
+    buckets=(100, 1000, 10000, 100000, 1000000, 10000000)
+)
+
 # Cache Metrics
 CACHE_HITS = Counter(
     'reservation_cache_hits_total',
     'Total number of cache hits',
-    ['cache_type']
+    ['cache_type', 'tier']
 )
 
 CACHE_MISSES = Counter(
@@ -28,11 +41,43 @@ CACHE_MISSES = Counter(
     ['cache_type']
 )
 
+CACHE_FILLS = Counter(
+    'reservation_cache_fills_total',
+    'Total number of values computed and stored in the cache',
+    ['cache_type']
+)
+
+CACHE_INVALIDATIONS = Counter(
+    'reservation_cache_invalidations_total',
+    'Total number of cache namespace invalidations and item evictions',
+    ['cache_type']
+)
+
+CACHE_ERRORS = Counter(
+    'reservation_cache_errors_total',
+    'Total number of cache lookups that fell back to the loader because Redis failed',
+    ['cache_type']
+)
+
+CACHE_REDIS_LATENCY = Histogram(
+    'reservation_cache_redis_latency_seconds',
+    'Latency of Redis operations made by the cache',
+    ['operation'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+CACHE_PAYLOAD_SIZE = Histogram(
+    'reservation_cache_payload_bytes',
+    'Size of the JSON payloads written to the cache',
+    ['cache_type'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+)
+
 # Database Metrics
 DB_QUERY_TIME = Histogram(
     'reservation_db_query_time_seconds',
     'Database query execution time',
-    ['query_type']
+    ['query_type', 'operation']
 )
 
 DB_CONNECTIONS = Gauge(
@@ -40,6 +85,37 @@ DB_CONNECTIONS = Gauge(
     'Number of active database connections'
 )
 
+DB_POOL_WAIT_TIME = Histogram(
+    'reservation_db_pool_wait_seconds',
+    'Time spent waiting to check a connection out of the pool',
+    ['pool'],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    'reservation_db_pool_timeouts_total',
+    'Checkouts that gave up waiting for a pool connection',
+    ['pool']
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    'reservation_db_pool_checked_out',
+    'Connections currently checked out of the pool',
+    ['pool']
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    'reservation_db_pool_overflow',
+    'Connections open beyond pool_size (negative while the pool is still filling)',
+    ['pool']
+)
+
+DB_POOL_IDLE = Gauge(
+    'reservation_db_pool_idle',
+    'Connections idle in the pool',
+    ['pool']
+)
+
 # Email Metrics
 EMAIL_SENT = Counter(
     'reservation_emails_sent_total',
@@ -70,19 +146,49 @@ CELERY_TASK_TIME = Histogram(
 def start_metrics_server(port: int = 8001):
     start_http_server(port)
 
+# Methods that get their own label; anything else a client sends is "other"
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "CONNECT", "TRACE"})
+
 # Middleware to track requests
-async def metrics_middleware(request, call_next):
-    start_time = time.time()
-    method = request.method
-    endpoint = request.url.path
-    
-    try:
-        response = await call_next(request)
-        status_code = response.status_code
-        REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status_code).inc()
-        REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(time.time() - start_time)
-        return response
-    except Exception as e:
-        REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=500).inc()
-        REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(time.time() - start_time)
-        raise e 
\ No newline at end of file
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request count, latency, size and concurrency.
+
+    Requests are labelled by the matched route template (``/reservations/{reservation_id}``),
+    never by the raw path, so the number of series stays fixed. Paths that
+    match no route share the ``unmatched`` label and non-standard methods the
+    ``other`` label.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"] if scope["method"] in HTTP_METHODS else "other"
+        status_code = 500
+        response_size = 0
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUEST_COUNT.labels(method=method, endpoint=endpoint, status=status_code).inc()
+            REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(time.perf_counter() - start_time)
+            RESPONSE_SIZE.labels(method=method, endpoint=endpoint).observe(response_size)
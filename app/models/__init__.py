@@ -1,3 +1,3 @@
-from app.models.models import Guest, Unit, Reservation
+from app.models.models import Guest, Unit, Reservation, OutboxMessage, UnitDayOccupancy
 
-__all__ = ["Guest", "Unit", "Reservation"] 
\ No newline at end of file
+__all__ = ["Guest", "Unit", "Reservation", "OutboxMessage", "UnitDayOccupancy"] 
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, Text, func
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, Date, ForeignKey, Boolean, Text, func
+from sqlalchemy.dialects.postgresql import ExcludeConstraint, JSONB
 from sqlalchemy.orm import relationship
 from app.database.database import Base
 
@@ -25,12 +26,60 @@ class Reservation(Base):
     __tablename__ = "reservations"
     
     id = Column(Integer, primary_key=True, index=True)
-    guest_id = Column(Integer, ForeignKey("guests.id", ondelete="CASCADE"))
-    unit_id = Column(Integer, ForeignKey("units.id", ondelete="CASCADE"))
+    guest_id = Column(Integer, ForeignKey("guests.id", ondelete="CASCADE"), index=True)
+    unit_id = Column(Integer, ForeignKey("units.id", ondelete="CASCADE"), index=True)
     check_in_date = Column(Date, index=True)
     check_out_date = Column(Date, index=True)
     status = Column(String(50), default="active")
     created_at = Column(Date, server_default=func.current_date())
     
+    __table_args__ = (
+        # No two active reservations of a unit may share a day. Both bounds are
+        # inclusive, matching crud.has_overlapping_reservation. unit_id is wrapped
+        # in a single-value range so plain GiST range operators can compare it
+        # without the btree_gist extension.
+        ExcludeConstraint(
+            (func.int4range(unit_id, unit_id, "[]"), "&&"),
+            (func.daterange(check_in_date, check_out_date, "[]"), "&&"),
+            name="reservations_unit_dates_excl",
+            using="gist",
+            where=status == "active"
+        ),
+        # Serves the overlap check: leading with check_out_date keeps past
+        # stays out of the scan (migration 0002_reservation_indexes)
+        Index(
+            "ix_reservations_active_unit_dates", unit_id, check_out_date, check_in_date,
+            postgresql_where=status == "active"
+        ),
+    )
+    
     guest = relationship("Guest", back_populates="reservations")
-    unit = relationship("Unit", back_populates="reservations") 
\ No newline at end of file
+    unit = relationship("Unit", back_populates="reservations")
+
+class OutboxMessage(Base):
+    """A Celery task to publish, written in the transaction that caused it.
+
+    The relay in app.outbox publishes pending rows and deletes them.
+    """
+    __tablename__ = "outbox"
+    
+    id = Column(BigInteger, primary_key=True)
+    task_name = Column(String(255), nullable=False)
+    args = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class UnitDayOccupancy(Base):
+    """Rollup of active reservations per unit and day, maintained by app.rollups.
+
+    A row exists only for days on which the unit is booked.
+    """
+    __tablename__ = "unit_day_occupancy"
+    
+    unit_id = Column(Integer, ForeignKey("units.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    reservations = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        # Reports scan a date range across every unit
+        Index("ix_unit_day_occupancy_day", "day"),
+    )
@@ -0,0 +1,77 @@
+"""Outbox relay: publishes the Celery tasks queued in the ``outbox`` table.
+
+Run one or more relays next to the API with ``python -m app.outbox``. Rows are
+claimed with FOR UPDATE SKIP LOCKED, so relays never publish the same batch
+concurrently. A row is deleted in the transaction that claimed it, after its
+task was handed to the broker; if that commit fails the batch is published
+again, so delivery is at-least-once. Each task id is derived from the row id,
+which lets consumers spot a redelivery.
+"""
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from typing import Optional
+import os
+import signal
+import threading
+from app.celery_app import celery_app
+from app.database import database
+from app.models.models import OutboxMessage
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "0.5"))
+
+def outbox_task_id(message_id: int) -> str:
+    return f"outbox-{message_id}"
+
+def relay_batch(db: Session, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Publish and delete up to ``batch_size`` pending messages.
+
+    Returns the number of messages published.
+    """
+    messages = db.scalars(
+        select(OutboxMessage)
+        .order_by(OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not messages:
+        db.rollback()
+        return 0
+
+    try:
+        # One broker connection for the whole batch
+        with celery_app.producer_or_acquire() as producer:
+            for message in messages:
+                celery_app.send_task(
+                    message.task_name, args=message.args,
+                    task_id=outbox_task_id(message.id), producer=producer
+                )
+    except Exception:
+        # The rows stay queued and are published again
+        db.rollback()
+        raise
+
+    db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_([message.id for message in messages])))
+    db.commit()
+    return len(messages)
+
+def run_relay(stop: Optional[threading.Event] = None) -> None:
+    """Relay until ``stop`` is set, polling while the outbox is empty."""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            with database.SessionLocal() as db:
+                published = relay_batch(db)
+        except Exception as e:
+            print(f"Outbox relay error: {str(e)}")
+            published = 0
+        # A full batch means more rows are probably waiting
+        if published < OUTBOX_BATCH_SIZE:
+            stop.wait(OUTBOX_POLL_INTERVAL)
+
+if __name__ == "__main__":
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    print("Outbox relay started")
+    run_relay(stop)
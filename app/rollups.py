@@ -0,0 +1,78 @@
+"""Occupancy rollup: booked days per unit in ``unit_day_occupancy``.
+
+Reservation writes queue a ``refresh_occupancy`` task through the outbox and
+the worker recomputes only the (unit, day range) pairs they touched. The
+table can be recomputed from scratch with ``python -m app.rollups rebuild``.
+"""
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import List
+import argparse
+
+# Refreshes of one unit are serialized so their DELETE and INSERT never interleave
+OCCUPANCY_LOCK_CLASS = 7201
+
+OCCUPANCY_CLEAR = """
+DELETE FROM unit_day_occupancy
+WHERE unit_id = :unit_id AND day BETWEEN :first AND :last
+"""
+
+OCCUPANCY_REFRESH = """
+INSERT INTO unit_day_occupancy (unit_id, day, reservations)
+SELECT r.unit_id, d.day::date, count(*)
+FROM reservations r
+CROSS JOIN LATERAL generate_series(
+    GREATEST(r.check_in_date, CAST(:first AS date)),
+    LEAST(r.check_out_date, CAST(:last AS date)),
+    interval '1 day'
+) AS d(day)
+WHERE r.unit_id = :unit_id
+  AND r.status = 'active'
+  AND r.check_in_date <= :last
+  AND r.check_out_date >= :first
+GROUP BY r.unit_id, d.day
+"""
+
+OCCUPANCY_REBUILD = """
+INSERT INTO unit_day_occupancy (unit_id, day, reservations)
+SELECT r.unit_id, d.day::date, count(*)
+FROM reservations r
+CROSS JOIN LATERAL generate_series(r.check_in_date, r.check_out_date, interval '1 day') AS d(day)
+WHERE r.status = 'active'
+GROUP BY r.unit_id, d.day
+"""
+
+def refresh_occupancy(db: Session, stays: List[list]) -> None:
+    """Recompute the rollup for each ``[unit_id, first_day, last_day]`` in ``stays``.
+
+    The result depends only on the committed reservations, so running the
+    same refresh twice, or out of order, is harmless.
+    """
+    # Sorted so concurrent refreshes take the unit locks in the same order
+    for unit_id, first, last in sorted(stays):
+        params = {"unit_id": unit_id, "first": date.fromisoformat(first), "last": date.fromisoformat(last)}
+        db.execute(text("SELECT pg_advisory_xact_lock(:lock_class, :unit_id)"), {
+            "lock_class": OCCUPANCY_LOCK_CLASS, "unit_id": unit_id
+        })
+        db.execute(text(OCCUPANCY_CLEAR), params)
+        db.execute(text(OCCUPANCY_REFRESH), params)
+    db.commit()
+
+def rebuild_occupancy(db: Session) -> int:
+    """Recompute the whole rollup in one transaction; returns the row count."""
+    # Refreshes wait for the rebuild instead of writing into a half-built table
+    db.execute(text("LOCK TABLE unit_day_occupancy IN EXCLUSIVE MODE"))
+    db.execute(text("DELETE FROM unit_day_occupancy"))
+    rows = db.execute(text(OCCUPANCY_REBUILD)).rowcount
+    db.commit()
+    return rows
+
+if __name__ == "__main__":
+    from app.database.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain the occupancy rollup")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+    with SessionLocal() as db:
+        print(f"Rebuilt unit_day_occupancy: {rebuild_occupancy(db)} rows")
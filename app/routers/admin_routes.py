@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, HTTPException
+from redis import RedisError
+
+from app.api.dependencies import require_admin
+from app.schemas import schemas
+from app.utils import cache
+
+router = APIRouter(prefix="/cache", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/stats", response_model=schemas.CacheStatsResponse)
+async def read_cache_stats() -> schemas.CacheStatsResponse:
+    """Hit ratios of this worker and key counts and sizes in Redis, per namespace."""
+    counts = cache.cache_stats.snapshot()
+    namespaces = []
+    for namespace in sorted(set(cache.known_namespaces()) | set(counts)):
+        namespace_counts = counts.get(namespace, {})
+        hits = namespace_counts.get("hit", 0)
+        misses = namespace_counts.get("miss", 0)
+        try:
+            stored = await cache.namespace_stats(namespace)
+        except RedisError as e:
+            raise HTTPException(status_code=503, detail=f"Redis is unavailable: {str(e)}")
+        namespaces.append({
+            "namespace": namespace,
+            "hits": hits,
+            "misses": misses,
+            "fills": namespace_counts.get("fill", 0),
+            "invalidations": namespace_counts.get("invalidation", 0),
+            "errors": namespace_counts.get("error", 0),
+            "hit_ratio": hits / (hits + misses) if hits + misses else None,
+            **stored
+        })
+    return {
+        "local_entries": len(cache.local_cache),
+        "local_bytes": cache.local_cache.size_bytes,
+        "namespaces": namespaces
+    }
@@ -1,11 +1,21 @@
 from app.schemas.schemas import (
     GuestBase, GuestCreate, GuestResponse,
     UnitBase, UnitCreate, UnitResponse,
-    ReservationBase, ReservationCreate, ReservationUpdate, ReservationResponse
+    ReservationBase, ReservationCreate, ReservationUpdate, ReservationResponse,
+    ReservationFilters,
+    BulkReservationCreate, BulkReservationItemResult, BulkReservationResponse,
+    ImportResult, AvailabilityResponse, AvailabilityCalendarResponse, Page,
+    OccupancyRow, OccupancyReportResponse,
+    CacheNamespaceStats, CacheStatsResponse
 )
 
 __all__ = [
     "GuestBase", "GuestCreate", "GuestResponse",
     "UnitBase", "UnitCreate", "UnitResponse",
-    "ReservationBase", "ReservationCreate", "ReservationUpdate", "ReservationResponse"
+    "ReservationBase", "ReservationCreate", "ReservationUpdate", "ReservationResponse",
+    "ReservationFilters",
+    "BulkReservationCreate", "BulkReservationItemResult", "BulkReservationResponse",
+    "ImportResult", "AvailabilityResponse", "AvailabilityCalendarResponse", "Page",
+    "OccupancyRow", "OccupancyReportResponse",
+    "CacheNamespaceStats", "CacheStatsResponse"
 ] 
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from typing import Generic, List, Literal, Optional, TypeVar
 from datetime import date
 
 class GuestBase(BaseModel):
@@ -35,7 +35,11 @@ class ReservationBase(BaseModel):
     check_out_date: date
 
 class ReservationCreate(ReservationBase):
-    pass
+    @model_validator(mode="after")
+    def check_dates(self) -> "ReservationCreate":
+        if self.check_out_date < self.check_in_date:
+            raise ValueError("check_out_date must not be before check_in_date")
+        return self
 
 class ReservationUpdate(BaseModel):
     guest_id: Optional[int] = None
@@ -47,4 +51,87 @@ class ReservationResponse(ReservationBase):
     id: int
     status: str
     
-    model_config = ConfigDict(from_attributes=True) 
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class ReservationFilters(BaseModel):
+    unit_id: Optional[int] = None
+    guest_id: Optional[int] = None
+    status: Optional[str] = None
+    # Reservations whose stay touches the [date_from, date_to] range
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+class BulkReservationCreate(BaseModel):
+    reservations: List[ReservationCreate] = Field(min_length=1, max_length=1000)
+    # all_or_nothing creates nothing unless every item is accepted;
+    # partial creates the accepted items and reports the rejected ones
+    mode: Literal["all_or_nothing", "partial"] = "all_or_nothing"
+
+class BulkReservationItemResult(BaseModel):
+    index: int
+    status: Literal["created", "rejected", "skipped"]
+    reservation: Optional[ReservationResponse] = None
+    error: Optional[str] = None
+
+class BulkReservationResponse(BaseModel):
+    created: int
+    rejected: int
+    results: List[BulkReservationItemResult]
+
+class ImportResult(BaseModel):
+    inserted: int
+    updated: int
+    rejected: int
+
+class AvailabilityResponse(BaseModel):
+    check_in: date
+    check_out: date
+    capacity: int
+    unit_ids: List[int]
+
+class AvailabilityCalendarResponse(BaseModel):
+    from_date: date
+    to_date: date
+    days: int
+    unit_ids: List[int]
+    bytes_per_unit: int
+    # Base64 of bytes_per_unit bytes per unit, in unit_ids order. Bit d % 8 of
+    # byte d // 8 is set when the unit is booked on from_date + d days.
+    occupancy: str
+
+class OccupancyRow(BaseModel):
+    # Unit id, day (YYYY-MM-DD) or month (YYYY-MM), depending on group_by
+    key: str
+    booked_days: int
+    # Unit-days in the group: units times days for day and month groups
+    available_days: int
+    occupancy: float
+
+class OccupancyReportResponse(BaseModel):
+    from_date: date
+    to_date: date
+    group_by: Literal["unit", "day", "month"]
+    rows: List[OccupancyRow]
+
+class CacheNamespaceStats(BaseModel):
+    namespace: str
+    hits: int
+    misses: int
+    fills: int
+    invalidations: int
+    errors: int
+    hit_ratio: Optional[float] = None
+    keys: int
+    bytes: int
+    truncated: bool
+
+class CacheStatsResponse(BaseModel):
+    local_entries: int
+    local_bytes: int
+    namespaces: List[CacheNamespaceStats]
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
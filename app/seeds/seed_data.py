@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
-from app.database.database import SessionLocal, engine
+from app.database.database import SessionLocal
+from app.database.migrate import upgrade_database
 from app.models.models import Guest, Unit, Reservation
 from faker import Faker
 import random
@@ -75,9 +76,8 @@ def seed_database():
     """Seed the database with initial data."""
     db = SessionLocal()
     try:
-        # Create tables if they don't exist
-        from app.models.models import Base
-        Base.metadata.create_all(bind=engine)
+        # Bring the schema up to date
+        upgrade_database()
         
         # Check if we already have data
         if db.query(Guest).count() == 0:
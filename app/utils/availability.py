@@ -0,0 +1,292 @@
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import threading
+import time
+
+# Seconds after which the index is rebuilt from the database. Each API worker
+# keeps its own index, so this bounds how long writes served by another
+# worker can stay invisible here.
+INDEX_MAX_AGE = float(os.getenv("AVAILABILITY_INDEX_MAX_AGE", "60"))
+
+UnitRow = Tuple[int, Optional[int], Optional[bool]]
+ReservationRow = Tuple[int, int, date, date]
+
+class _UnitIntervals:
+    """Active (check_in, check_out) intervals of one unit, sorted by check-in."""
+
+    __slots__ = ("starts", "ends", "ids", "max_ends")
+
+    def __init__(self) -> None:
+        self.starts: List[date] = []
+        self.ends: List[date] = []
+        self.ids: List[int] = []
+        # max_ends[i] is the latest check-out among the first i + 1 intervals
+        self.max_ends: List[date] = []
+
+    @classmethod
+    def build(cls, rows: List[Tuple[date, date, int]]) -> "_UnitIntervals":
+        """Build from (check_in, check_out, id) rows in one pass.
+
+        Rows already ordered by check-in (as the loader selects them) make
+        the sort linear.
+        """
+        intervals = cls()
+        rows.sort(key=lambda row: row[0])
+        running = None
+        for check_in, check_out, reservation_id in rows:
+            running = check_out if running is None or check_out > running else running
+            intervals.starts.append(check_in)
+            intervals.ends.append(check_out)
+            intervals.ids.append(reservation_id)
+            intervals.max_ends.append(running)
+        return intervals
+
+    def add(self, reservation_id: int, check_in: date, check_out: date) -> None:
+        i = bisect_right(self.starts, check_in)
+        self.starts.insert(i, check_in)
+        self.ends.insert(i, check_out)
+        self.ids.insert(i, reservation_id)
+        self.max_ends.insert(i, check_out)
+        self._fix_max_ends(i)
+
+    def remove(self, reservation_id: int) -> None:
+        i = self.ids.index(reservation_id)
+        del self.starts[i], self.ends[i], self.ids[i], self.max_ends[i]
+        self._fix_max_ends(i)
+
+    def overlaps(self, check_in: date, check_out: date) -> bool:
+        # Same rule as crud.has_overlapping_reservation: an interval conflicts
+        # when it starts on or before check_out and ends on or after check_in.
+        i = bisect_right(self.starts, check_out)
+        return i > 0 and self.max_ends[i - 1] >= check_in
+
+    def _fix_max_ends(self, start: int) -> None:
+        running = self.max_ends[start - 1] if start > 0 else None
+        for i in range(start, len(self.ends)):
+            end = self.ends[i]
+            running = end if running is None or end > running else running
+            self.max_ends[i] = running
+
+class DayBitmap:
+    """One bit per day from ``origin``, set on the days a unit is booked.
+
+    Bit ``i % 8`` of byte ``i // 8`` stands for ``origin + i days``. The
+    bitmap grows in whole bytes in either direction as ranges are marked.
+    """
+
+    __slots__ = ("origin", "bits")
+
+    def __init__(self, origin: date) -> None:
+        self.origin = origin
+        self.bits = bytearray()
+
+    def mark(self, first: date, last: date, booked: bool = True) -> None:
+        """Set (or clear) every day from ``first`` to ``last`` inclusive."""
+        if first > last:
+            return
+        if first < self.origin:
+            shift = -(-(self.origin - first).days // 8)
+            self.bits[0:0] = bytes(shift)
+            self.origin -= timedelta(days=8 * shift)
+        start = (first - self.origin).days
+        end = (last - self.origin).days + 1
+        lo, hi = start >> 3, ((end - 1) >> 3) + 1
+        if len(self.bits) < hi:
+            self.bits.extend(bytes(hi - len(self.bits)))
+
+        # Apply the whole range as one integer mask over the bytes it touches
+        chunk = int.from_bytes(self.bits[lo:hi], "little")
+        mask = ((1 << (end - start)) - 1) << (start - (lo << 3))
+        chunk = chunk | mask if booked else chunk & ~mask
+        self.bits[lo:hi] = chunk.to_bytes(hi - lo, "little")
+
+    def window(self, first: date, days: int) -> bytes:
+        """The ``days`` bits starting at ``first``, packed the same way."""
+        offset = (first - self.origin).days
+        value = 0
+        if offset + days > 0 and offset < len(self.bits) * 8:
+            lo = max(offset, 0)
+            chunk = self.bits[lo >> 3:((offset + days - 1) >> 3) + 1]
+            value = int.from_bytes(chunk, "little") >> (lo & 7)
+            value = value << (lo - offset) if offset < 0 else value
+        value &= (1 << days) - 1
+        return value.to_bytes(-(-days // 8), "little")
+
+def build_bitmap(origin: date, ranges: Iterable[Tuple[date, date]]) -> DayBitmap:
+    """Bitmap with every (first, last) range in ``ranges`` marked."""
+    ranges = list(ranges)
+    bitmap = DayBitmap(origin)
+    if not ranges:
+        return bitmap
+    first = min(check_in for check_in, _ in ranges)
+    if first < origin:
+        bitmap.origin = origin - timedelta(days=8 * -(-(origin - first).days // 8))
+    # Built as one integer, converted to bytes once
+    value = 0
+    for check_in, check_out in ranges:
+        value |= ((1 << ((check_out - check_in).days + 1)) - 1) << (check_in - bitmap.origin).days
+    bitmap.bits = bytearray(value.to_bytes(-(-value.bit_length() // 8), "little"))
+    return bitmap
+
+class _Snapshot:
+    def __init__(self, horizon: Optional[date] = None) -> None:
+        # Reservations that ended before the horizon were left out of the load
+        self.horizon = horizon
+        self.capacities: Dict[int, int] = {}
+        self.intervals: Dict[int, _UnitIntervals] = {}
+        self.reservations: Dict[int, Tuple[int, date, date]] = {}
+        # Booked days per unit, kept in step with intervals
+        self.days: Dict[int, DayBitmap] = {}
+
+    def upsert_unit(self, unit_id: int, capacity: Optional[int], is_available: Optional[bool]) -> None:
+        if is_available is False:
+            self.capacities.pop(unit_id, None)
+        else:
+            self.capacities[unit_id] = capacity or 0
+
+    def upsert_reservation(self, reservation_id: int, unit_id: int, check_in: date, check_out: date, status: str) -> None:
+        previous = self.reservations.pop(reservation_id, None)
+        if previous is not None:
+            self._unmark(reservation_id, *previous)
+        if status != "active":
+            return
+        self.reservations[reservation_id] = (unit_id, check_in, check_out)
+        self.intervals.setdefault(unit_id, _UnitIntervals()).add(reservation_id, check_in, check_out)
+        self.days.setdefault(unit_id, DayBitmap(self.horizon or check_in)).mark(check_in, check_out)
+
+    def _unmark(self, reservation_id: int, unit_id: int, check_in: date, check_out: date) -> None:
+        intervals = self.intervals[unit_id]
+        intervals.remove(reservation_id)
+        days = self.days[unit_id]
+        days.mark(check_in, check_out, booked=False)
+        # Re-mark any remaining reservation that shared those days
+        for start, end in zip(intervals.starts, intervals.ends):
+            if start > check_out:
+                break
+            if end >= check_in:
+                days.mark(max(start, check_in), min(end, check_out))
+
+class AvailabilityIndex:
+    """In-process index answering "which units are free" without a query per unit.
+
+    The index is rebuilt from the database with ``begin_load``/``finish_load``
+    and kept current by the crud write paths. Writes that happen while a
+    rebuild is querying the database are journaled and replayed on the new
+    snapshot, so they are never lost by the swap.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshot = _Snapshot()
+        self._journals: List[list] = []
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_stale(self, max_age: float = INDEX_MAX_AGE) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > max_age
+
+    def mark_stale(self) -> None:
+        """Keep serving the current snapshot but rebuild it on the next lookup."""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._loaded_at = float("-inf")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._snapshot = _Snapshot()
+            self._loaded_at = None
+
+    def begin_load(self) -> list:
+        journal: list = []
+        with self._lock:
+            self._journals.append(journal)
+        return journal
+
+    def finish_load(
+        self,
+        journal: list,
+        units: Iterable[UnitRow],
+        reservations: Iterable[ReservationRow],
+        horizon: Optional[date] = None
+    ) -> None:
+        """Swap in a snapshot built from active reservations.
+
+        ``horizon`` is the earliest check-out the loader selected; ranges
+        starting before it are not answered by this snapshot (see ``covers``).
+        """
+        snapshot = _Snapshot(horizon)
+        for unit_id, capacity, is_available in units:
+            snapshot.upsert_unit(unit_id, capacity, is_available)
+        by_unit: Dict[int, List[Tuple[date, date, int]]] = {}
+        for reservation_id, unit_id, check_in, check_out in reservations:
+            by_unit.setdefault(unit_id, []).append((check_in, check_out, reservation_id))
+            snapshot.reservations[reservation_id] = (unit_id, check_in, check_out)
+        for unit_id, rows in by_unit.items():
+            snapshot.intervals[unit_id] = _UnitIntervals.build(rows)
+            snapshot.days[unit_id] = build_bitmap(horizon or rows[0][0], ((row[0], row[1]) for row in rows))
+
+        with self._lock:
+            for method, args in journal:
+                getattr(snapshot, method)(*args)
+            self._journals.remove(journal)
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+
+    def abort_load(self, journal: list) -> None:
+        with self._lock:
+            self._journals.remove(journal)
+
+    def upsert_unit(self, unit_id: int, capacity: Optional[int], is_available: Optional[bool] = True) -> None:
+        self._apply("upsert_unit", (unit_id, capacity, is_available))
+
+    def upsert_reservation(self, reservation_id: int, unit_id: int, check_in: date, check_out: date, status: str = "active") -> None:
+        self._apply("upsert_reservation", (reservation_id, unit_id, check_in, check_out, status))
+
+    def covers(self, check_in: date) -> bool:
+        """Whether ranges starting on ``check_in`` can be answered from the index."""
+        horizon = self._snapshot.horizon
+        return horizon is None or check_in >= horizon
+
+    def is_available(self, unit_id: int, check_in: date, check_out: date) -> bool:
+        with self._lock:
+            intervals = self._snapshot.intervals.get(unit_id)
+            return intervals is None or not intervals.overlaps(check_in, check_out)
+
+    def available_units(self, check_in: date, check_out: date, capacity: int = 1) -> List[int]:
+        with self._lock:
+            snapshot = self._snapshot
+            return sorted(
+                unit_id
+                for unit_id, unit_capacity in snapshot.capacities.items()
+                if unit_capacity >= capacity
+                and (unit_id not in snapshot.intervals or not snapshot.intervals[unit_id].overlaps(check_in, check_out))
+            )
+
+    def calendar(self, first: date, days: int, unit_ids: Optional[List[int]] = None) -> Tuple[List[int], bytes]:
+        """Booked days of each unit, ``ceil(days / 8)`` packed bytes per unit.
+
+        Without ``unit_ids`` every bookable unit is included, in id order.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if unit_ids is None:
+                unit_ids = sorted(snapshot.capacities)
+            empty = bytes(-(-days // 8))
+            return unit_ids, b"".join(
+                snapshot.days[unit_id].window(first, days) if unit_id in snapshot.days else empty
+                for unit_id in unit_ids
+            )
+
+    def _apply(self, method: str, args: tuple) -> None:
+        with self._lock:
+            getattr(self._snapshot, method)(*args)
+            for journal in self._journals:
+                journal.append((method, args))
+
+# Shared index for this process
+availability_index = AvailabilityIndex()
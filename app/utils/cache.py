@@ -1,61 +1,658 @@
-from typing import Any, Optional
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import hashlib
+import inspect
 import json
-from redis import Redis
+import math
+import random
+import threading
+import time
+import uuid
+from redis import RedisError
+from redis.asyncio import ConnectionPool, Redis
 import os
+from contextlib import contextmanager
 from functools import wraps
-
-# Initialize Redis client
-redis_client = Redis(
-    host=os.getenv("REDIS_HOST", "redis"),
-    port=int(os.getenv("REDIS_PORT", "6379")),
-    db=0,
-    decode_responses=True
+from starlette.requests import Request
+from starlette.responses import Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from app.metrics import (
+    CACHE_ERRORS, CACHE_FILLS, CACHE_HITS, CACHE_INVALIDATIONS, CACHE_MISSES,
+    CACHE_PAYLOAD_SIZE, CACHE_REDIS_LATENCY
 )
 
-def cache_key(prefix: str, *args, **kwargs) -> str:
-    """Generate a cache key from function arguments."""
-    key_parts = [prefix]
-    key_parts.extend(str(arg) for arg in args)
-    key_parts.extend(f"{k}:{v}" for k, v in sorted(kwargs.items()))
-    return ":".join(key_parts)
+# Redis client, created on first use; every cache call in this process shares
+# its pool. Tests replace redis_client with an in-memory server.
+redis_pool: Optional[ConnectionPool] = None
+redis_client: Optional[Redis] = None
+_redis_lock = threading.Lock()
+
+def get_redis() -> Redis:
+    """The shared Redis client; no connection is opened until a command runs."""
+    global redis_pool, redis_client
+    if redis_client is None:
+        with _redis_lock:
+            if redis_client is None:
+                redis_pool = ConnectionPool(
+                    host=os.getenv("REDIS_HOST", "redis"),
+                    port=int(os.getenv("REDIS_PORT", "6379")),
+                    db=0,
+                    max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+                    decode_responses=True
+                )
+                redis_client = Redis(connection_pool=redis_pool)
+    return redis_client
+
+async def close_redis() -> None:
+    """Disconnect the pooled connections, if the pool was ever created."""
+    if redis_pool is not None:
+        await redis_pool.disconnect()
+
+# In-process (L1) cache limits. Entries live at most CACHE_L1_TTL seconds even
+# when an invalidation message is missed.
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1024"))
+CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(16 * 1024 * 1024)))
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", "30"))
+
+# Pub/sub channel carrying {"namespace", "generation"} after every namespace
+# invalidation and {"keys"} after item evictions
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Values that are not part of what a cached call returns and never go into keys
+_UNKEYED_TYPES = (Request, Response, Session, AsyncSession, async_sessionmaker)
+
+class LocalCache:
+    """Thread-safe LRU of JSON payloads with per-entry TTL and a byte budget."""
+
+    def __init__(self, max_entries: int = CACHE_L1_MAX_ENTRIES, max_bytes: int = CACHE_L1_MAX_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def drop_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+class _Generations:
+    """Namespace generations known to this process.
+
+    They are only trusted while the invalidation listener is subscribed;
+    otherwise every lookup reads the generation from Redis. ``epoch`` changes
+    with every (re)subscription so that values read from Redis before it are
+    not kept.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._known: Dict[str, int] = {}
+        self.subscribed = False
+        self.epoch = 0
+
+    def get(self, namespace: str) -> Optional[int]:
+        with self._lock:
+            return self._known.get(namespace) if self.subscribed else None
+
+    def observe(self, namespace: str, generation: int, epoch: Optional[int] = None) -> None:
+        # Generations only grow, so the larger value is always the current one
+        with self._lock:
+            if not self.subscribed or (epoch is not None and epoch != self.epoch):
+                return
+            if generation > self._known.get(namespace, -1):
+                self._known[namespace] = generation
+
+    def set_subscribed(self, subscribed: bool) -> None:
+        with self._lock:
+            self.subscribed = subscribed
+            self.epoch += 1
+            self._known.clear()
+
+local_cache = LocalCache()
+_generations = _Generations()
+
+def generation_key(namespace: str) -> str:
+    return f"cache:gen:{namespace}"
+
+def cache_key(namespace: str, generation: int, params: Dict[str, Any]) -> str:
+    """Build a key from a namespace generation and normalized call parameters."""
+    normalized = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    return f"cache:{namespace}:v{generation}:{digest}"
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", exclude_none=True)
+    return value
+
+def _call_params(signature: inspect.Signature, args: tuple, kwargs: dict) -> Dict[str, Any]:
+    bound = signature.bind_partial(*args, **kwargs)
+    bound.apply_defaults()
+    return {
+        name: _normalize(value)
+        for name, value in bound.arguments.items()
+        if not isinstance(value, _UNKEYED_TYPES)
+    }
+
+# Instrumentation
+class CacheStats:
+    """Per-namespace counters of this process, mirrored to Prometheus."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, namespace: str, event: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(namespace, {"hit": 0, "miss": 0, "fill": 0, "invalidation": 0, "error": 0})
+            counts[event] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in self._counts.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+cache_stats = CacheStats()
+# Namespaces and item prefixes used in this process
+_namespaces: set = set()
+
+def _record(namespace: str, event: str, tier: Optional[str] = None, size: Optional[int] = None) -> None:
+    cache_stats.record(namespace, event)
+    if event == "hit":
+        CACHE_HITS.labels(cache_type=namespace, tier=tier).inc()
+    elif event == "miss":
+        CACHE_MISSES.labels(cache_type=namespace).inc()
+    elif event == "fill":
+        CACHE_FILLS.labels(cache_type=namespace).inc()
+        CACHE_PAYLOAD_SIZE.labels(cache_type=namespace).observe(size)
+    elif event == "invalidation":
+        CACHE_INVALIDATIONS.labels(cache_type=namespace).inc()
+    else:
+        CACHE_ERRORS.labels(cache_type=namespace).inc()
+
+@contextmanager
+def _timed(operation: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        CACHE_REDIS_LATENCY.labels(operation=operation).observe(time.perf_counter() - started)
+
+async def namespace_stats(namespace: str, max_keys: int = 10000) -> Dict[str, Any]:
+    """Count keys and payload bytes of a namespace in Redis.
+
+    Uses SCAN, never KEYS, and stops after ``max_keys`` keys; ``truncated``
+    tells whether it did. Keys of older generations still count until they
+    expire.
+    """
+    keys = 0
+    payload_bytes = 0
+    async for batch in _scan_batches(f"cache:{namespace}:*", max_keys):
+        keys += len(batch)
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for key in batch:
+                pipe.strlen(key)
+            with _timed("pipeline"):
+                payload_bytes += sum(await pipe.execute())
+    return {"keys": keys, "bytes": payload_bytes, "truncated": keys >= max_keys}
+
+async def _scan_batches(pattern: str, max_keys: int, batch_size: int = 500):
+    cursor, seen = 0, 0
+    while True:
+        with _timed("scan"):
+            cursor, batch = await get_redis().scan(cursor, match=pattern, count=batch_size)
+        batch = batch[:max_keys - seen]
+        seen += len(batch)
+        if batch:
+            yield batch
+        if cursor == 0 or seen >= max_keys:
+            return
+
+def known_namespaces() -> List[str]:
+    return sorted(_namespaces)
+
+def item_key(prefix: str, item_id: Any) -> str:
+    return f"cache:{prefix}:{item_id}"
+
+async def get_generation(namespace: str) -> int:
+    generation = _generations.get(namespace)
+    if generation is None:
+        epoch = _generations.epoch
+        with _timed("get"):
+            generation = int(await get_redis().get(generation_key(namespace)) or 0)
+        _generations.observe(namespace, generation, epoch)
+    return generation
+
+async def bump_generation(namespace: str) -> None:
+    """Invalidate every entry of a namespace in O(1).
+
+    Entries written under older generations are never read again and expire
+    through their TTL. Other workers learn the new generation over pub/sub
+    and drop their in-process entries for the namespace.
+    """
+    local_cache.drop_prefix(f"cache:{namespace}:")
+    try:
+        with _timed("incr"):
+            generation = await get_redis().incr(generation_key(namespace))
+        _generations.observe(namespace, generation)
+        with _timed("publish"):
+            await get_redis().publish(INVALIDATION_CHANNEL, json.dumps({"namespace": namespace, "generation": generation}))
+        _record(namespace, "invalidation")
+    except RedisError as e:
+        print(f"Error invalidating cache namespace {namespace}: {str(e)}")
+
+def _apply_invalidation(message: str) -> None:
+    payload = json.loads(message)
+    if "namespace" in payload:
+        _generations.observe(payload["namespace"], int(payload["generation"]))
+        local_cache.drop_prefix(f"cache:{payload['namespace']}:")
+    for key in payload.get("keys", []):
+        local_cache.delete(key)
+
+async def _listen_for_invalidations() -> None:
+    """Apply invalidations published by other workers until cancelled."""
+    while True:
+        pubsub = get_redis().pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "subscribe":
+                    # Trust cached generations only once Redis confirms the
+                    # subscription; nothing published after that can be missed
+                    _generations.set_subscribed(True)
+                elif message["type"] == "message":
+                    _apply_invalidation(message["data"])
+        except (RedisError, ValueError) as e:
+            print(f"Cache invalidation listener error: {str(e)}")
+        finally:
+            _generations.set_subscribed(False)
+            await pubsub.aclose()
+        await asyncio.sleep(1.0)
+
+_listener: Optional[asyncio.Task] = None
+
+def start_invalidation_listener() -> None:
+    global _listener
+    if _listener is None or _listener.done():
+        _listener = asyncio.create_task(_listen_for_invalidations())
+
+async def stop_invalidation_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
+
+# Seconds a loader may hold the cross-worker lock for one key
+CACHE_LOCK_TTL = float(os.getenv("CACHE_LOCK_TTL", "10"))
+
+# Loads in flight in this process, keyed by cache key. Misses join them.
+_inflight: Dict[str, asyncio.Task] = {}
+# Background refreshes, keyed by cache key and referenced until they finish.
+# Misses never join them: a refresh gives up (returns None) when another
+# worker holds the lock.
+_refreshes: Dict[str, asyncio.Task] = {}
+
+def _lock_key(key: str) -> str:
+    return f"cache:lock:{key}"
+
+async def _release_lock(key: str, token: str) -> None:
+    # Delete the lock only while it is still ours
+    try:
+        async with get_redis().pipeline(transaction=True) as pipe:
+            await pipe.watch(_lock_key(key))
+            if await pipe.get(_lock_key(key)) == token:
+                pipe.multi()
+                pipe.delete(_lock_key(key))
+                await pipe.execute()
+            else:
+                await pipe.unwatch()
+    except RedisError:
+        pass
+
+def _entry_is_fresh(entry: dict, now: float, beta: float = 0.0) -> bool:
+    """Whether an entry is fresh, with XFetch early expiry when ``beta`` > 0.
+
+    Each reader expires the entry early with a probability that grows as the
+    soft expiry nears and with how long the value took to compute, so one
+    request usually refreshes a hot key before the others see it expire.
+    """
+    if beta <= 0:
+        return now < entry["e"]
+    return now - entry["d"] * beta * math.log(1.0 - random.random()) < entry["e"]
+
+def _start_once(tasks: Dict[str, asyncio.Task], key: str, start: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+    # Tasks of another event loop (a previous TestClient, a worker loop) are ignored
+    task = tasks.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.create_task(start())
+        tasks[key] = task
+        task.add_done_callback(lambda done: tasks.pop(key, None) if tasks.get(key) is done else None)
+    return task
+
+class _Loader:
+    """Fills one cached function's entries, at most one load per key."""
+
+    def __init__(self, namespace: str, ttl: int, stale_ttl: int, adapter: Optional[TypeAdapter]) -> None:
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.adapter = adapter
+        self.local_ttl = min(ttl + stale_ttl, CACHE_L1_TTL)
+
+    async def read(self, key: str) -> Tuple[Optional[dict], str]:
+        """Return the entry for ``key`` and the tier it came from."""
+        raw = local_cache.get(key)
+        if raw is not None:
+            return json.loads(raw), "local"
+        with _timed("get"):
+            raw = await get_redis().get(key)
+        if raw is None:
+            return None, "redis"
+        local_cache.set(key, raw, self.local_ttl)
+        return json.loads(raw), "redis"
+
+    def load(self, key: str, call: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start (or join) the single in-process load of ``key``."""
+        return _start_once(_inflight, key, lambda: self._load(key, call, wait=True))
+
+    def refresh(self, key: str, call: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start (or join) the background refresh of ``key``; skipped if another worker is loading it."""
+        return _start_once(_refreshes, key, lambda: self._load(key, call, wait=False))
+
+    async def _load(self, key: str, call: Callable[[], Awaitable[Any]], wait: bool) -> Any:
+        token = uuid.uuid4().hex
+        try:
+            with _timed("set"):
+                acquired = await get_redis().set(_lock_key(key), token, nx=True, px=int(CACHE_LOCK_TTL * 1000))
+        except RedisError:
+            acquired = True
+        if not acquired:
+            if not wait:
+                # Another worker is already refreshing this key
+                return None
+            entry = await self._wait_for_fill(key)
+            if entry is not None:
+                return entry["v"]
+
+        try:
+            started = time.perf_counter()
+            result = await call()
+            if self.adapter is not None:
+                result = self.adapter.dump_python(self.adapter.validate_python(result, from_attributes=True), mode="json")
+            entry = {"v": result, "d": time.perf_counter() - started, "e": time.time() + self.ttl}
+            payload = json.dumps(entry)
+            _record(self.namespace, "fill", size=len(payload))
+            try:
+                with _timed("setex"):
+                    await get_redis().setex(key, self.ttl + self.stale_ttl, payload)
+            except RedisError:
+                pass
+            local_cache.set(key, payload, self.local_ttl)
+            return result
+        finally:
+            if acquired:
+                await _release_lock(key, token)
+
+    async def _wait_for_fill(self, key: str) -> Optional[dict]:
+        # Poll for the value another worker is loading, then give up and load
+        deadline = time.monotonic() + CACHE_LOCK_TTL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            try:
+                with _timed("pipeline"):
+                    raw, locked = await get_redis().pipeline(transaction=False).get(key).exists(_lock_key(key)).execute()
+            except RedisError:
+                return None
+            if raw is not None:
+                entry = json.loads(raw)
+                if _entry_is_fresh(entry, time.time()):
+                    local_cache.set(key, raw, self.local_ttl)
+                    return entry
+            if not locked:
+                # The other loader failed or gave up
+                return None
+        return None
+
+def _fresh_session_call(func, bound: inspect.BoundArguments) -> Callable[[], Awaitable[Any]]:
+    """Call ``func`` with new async sessions in place of the request's.
+
+    Shared loads and background refreshes outlive the request whose session
+    they would otherwise use.
+    """
+    async def call():
+        arguments = dict(bound.arguments)
+        sessions = []
+        for name, value in arguments.items():
+            if isinstance(value, AsyncSession):
+                arguments[name] = AsyncSession(bind=value.bind, autoflush=False, expire_on_commit=False)
+                sessions.append(arguments[name])
+        try:
+            return await func(**arguments)
+        finally:
+            for session in sessions:
+                await session.close()
+    return call
+
+def _refresh_in_background(loader: _Loader, key: str, call: Callable[[], Awaitable[Any]]) -> None:
+    if key in _inflight:
+        return
+    task = loader.refresh(key, call)
+    # Failed refreshes leave the old entry in place until it expires
+    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+def cached(
+    namespace: str,
+    ttl: int = 300,
+    response_model: Optional[Any] = None,
+    stale_ttl: int = 0,
+    early_refresh: float = 0.0
+):
+    """Decorator to cache function results in process and in Redis.
+
+    Keys are built from the call parameters, leaving out sessions, requests
+    and responses, plus the current generation of ``namespace``. Results are
+    stored as JSON; ``response_model`` converts ORM results before they are
+    stored. The wrapper returns the JSON form on hits and misses alike.
+    When Redis is unavailable the function is called directly.
+
+    Misses are loaded once per key: concurrent callers in this process share
+    the load and other workers wait on a short Redis lock. With ``stale_ttl``
+    an expired entry is still served for that many seconds while it is
+    refreshed in the background; ``early_refresh`` is the XFetch beta that
+    starts those refreshes shortly before expiry (1.0 is the usual value).
+    """
+    adapter = TypeAdapter(response_model) if response_model is not None else None
+    loader = _Loader(namespace, ttl, stale_ttl, adapter)
+    _namespaces.add(namespace)
 
-def cached(ttl: int = 300):
-    """Decorator to cache function results in Redis."""
     def decorator(func):
+        signature = inspect.signature(func)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Generate cache key
-            key = cache_key(func.__name__, *args, **kwargs)
-            
-            # Try to get from cache
-            cached_value = redis_client.get(key)
-            if cached_value is not None:
-                return json.loads(cached_value)
-            
-            # Execute function if not in cache
-            result = await func(*args, **kwargs)
-            
-            # Store in cache
-            redis_client.setex(key, ttl, json.dumps(result))
-            
-            return result
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = _call_params(signature, args, kwargs)
+
+            # Try the in-process cache, then Redis
+            try:
+                key = cache_key(namespace, await get_generation(namespace), params)
+                entry, tier = await loader.read(key)
+            except RedisError:
+                _record(namespace, "error")
+                return await func(*args, **kwargs)
+
+            if entry is not None:
+                now = time.time()
+                if _entry_is_fresh(entry, now, early_refresh):
+                    _record(namespace, "hit", tier=tier)
+                    return entry["v"]
+                if now < entry["e"] + stale_ttl:
+                    _record(namespace, "hit", tier="stale")
+                    _refresh_in_background(loader, key, _fresh_session_call(func, bound))
+                    return entry["v"]
+
+            _record(namespace, "miss")
+
+            # Execute function if not in cache, once per key. The shared load
+            # opens its own sessions: callers that joined it must not fail
+            # when the first caller's request is cancelled and its session closed.
+            return await asyncio.shield(loader.load(key, _fresh_session_call(func, bound)))
         return wrapper
     return decorator
 
-def invalidate_cache(prefix: str):
-    """Decorator to invalidate cache entries matching a prefix."""
+def invalidate_cache(*namespaces: str):
+    """Decorator to invalidate cache namespaces after the call succeeds."""
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Execute the function
             result = await func(*args, **kwargs)
-            
+
             # Invalidate cache
-            pattern = f"{prefix}:*"
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
-            
+            for namespace in namespaces:
+                await bump_generation(namespace)
+
             return result
         return wrapper
-    return decorator 
\ No newline at end of file
+    return decorator
+
+async def get_items(
+    prefix: str,
+    ids: Iterable[int],
+    load: Callable[[List[int]], Awaitable[list]],
+    ttl: int = 300,
+    response_model: Optional[Any] = None
+) -> Dict[int, Any]:
+    """Fetch many per-item entries with one MGET and backfill misses in one pipeline.
+
+    ``load`` receives the ids missing from both cache tiers and returns the
+    objects it found; each must expose an ``id``. Returns the JSON form of
+    every item found, keyed by id.
+    """
+    adapter = TypeAdapter(response_model) if response_model is not None else None
+    local_ttl = min(ttl, CACHE_L1_TTL)
+    found: Dict[int, Any] = {}
+    _namespaces.add(prefix)
+
+    remote_ids = []
+    for item_id in dict.fromkeys(ids):
+        cached_value = local_cache.get(item_key(prefix, item_id))
+        if cached_value is not None:
+            _record(prefix, "hit", tier="local")
+            found[item_id] = json.loads(cached_value)
+        else:
+            remote_ids.append(item_id)
+    if not remote_ids:
+        return found
+
+    redis_available = True
+    try:
+        with _timed("mget"):
+            values = await get_redis().mget([item_key(prefix, item_id) for item_id in remote_ids])
+    except RedisError:
+        redis_available = False
+        values = [None] * len(remote_ids)
+
+    missing = []
+    for item_id, cached_value in zip(remote_ids, values):
+        if cached_value is None:
+            _record(prefix, "miss")
+            missing.append(item_id)
+        else:
+            _record(prefix, "hit", tier="redis")
+            local_cache.set(item_key(prefix, item_id), cached_value, local_ttl)
+            found[item_id] = json.loads(cached_value)
+    if not missing:
+        return found
+
+    loaded = {}
+    for item in await load(missing):
+        value = adapter.dump_python(adapter.validate_python(item, from_attributes=True), mode="json") if adapter else item
+        loaded[value["id"]] = value
+    payloads = {item_id: json.dumps(value) for item_id, value in loaded.items()}
+    for payload in payloads.values():
+        _record(prefix, "fill", size=len(payload))
+    if redis_available and loaded:
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                for item_id, payload in payloads.items():
+                    pipe.setex(item_key(prefix, item_id), ttl, payload)
+                with _timed("pipeline"):
+                    await pipe.execute()
+        except RedisError:
+            pass
+    for item_id, payload in payloads.items():
+        local_cache.set(item_key(prefix, item_id), payload, local_ttl)
+    found.update(loaded)
+    return found
+
+async def evict_items(prefix: str, ids: Iterable[int]) -> None:
+    """Drop per-item entries here, in Redis and in every other worker."""
+    keys = [item_key(prefix, item_id) for item_id in ids]
+    for key in keys:
+        local_cache.delete(key)
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.delete(*keys)
+            pipe.publish(INVALIDATION_CHANNEL, json.dumps({"keys": keys}))
+            with _timed("pipeline"):
+                await pipe.execute()
+        _record(prefix, "invalidation")
+    except RedisError as e:
+        print(f"Error evicting cache items {keys}: {str(e)}")
@@ -1,6 +1,10 @@
 from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from typing import Any, Dict, Optional
 
+# SQLSTATE raised by Postgres when an EXCLUDE constraint rejects a row
+EXCLUSION_VIOLATION = "23P01"
+
 class ReservationError(HTTPException):
     """Base class for reservation-related errors."""
     def __init__(
@@ -11,28 +15,63 @@ class ReservationError(HTTPException):
     ) -> None:
         super().__init__(status_code=status_code, detail=detail, headers=headers)
 
-class UnitNotFoundError(ReservationError):
-    """Raised when a unit is not found."""
+class UnitNotFoundError(ReservationError, ValueError):
+    """Raised when a unit is not found.
+
+    Also a ValueError, like OverlappingReservationError.
+    """
     def __init__(self, unit_id: int) -> None:
         super().__init__(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Unit with id {unit_id} not found"
+            detail="Unit not found"
         )
 
-class GuestNotFoundError(ReservationError):
-    """Raised when a guest is not found."""
+    def __str__(self) -> str:
+        return self.detail
+
+class GuestNotFoundError(ReservationError, ValueError):
+    """Raised when a guest is not found.
+
+    Also a ValueError, like OverlappingReservationError.
+    """
     def __init__(self, guest_id: int) -> None:
         super().__init__(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Guest with id {guest_id} not found"
+            detail="Guest not found"
+        )
+
+    def __str__(self) -> str:
+        return self.detail
+
+class DuplicateGuestError(ReservationError):
+    """Raised when a guest with the same email already exists."""
+    def __init__(self, email: str) -> None:
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Guest with email {email} already exists"
         )
 
-class OverlappingReservationError(ReservationError):
-    """Raised when there's an overlapping reservation."""
+class OverlappingReservationError(ReservationError, ValueError):
+    """Raised when there's an overlapping reservation.
+
+    Also a ValueError, which is what crud callers have always caught.
+    """
     def __init__(self, unit_id: int) -> None:
+        self.unit_id = unit_id
         super().__init__(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Unit {unit_id} is already reserved for these dates"
+            detail="Unit is already reserved for these dates"
+        )
+
+    def __str__(self) -> str:
+        return self.detail
+
+class InvalidCursorError(ReservationError):
+    """Raised when a pagination cursor cannot be used."""
+    def __init__(self, detail: str) -> None:
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
         )
 
 class DatabaseError(ReservationError):
@@ -41,4 +80,8 @@ class DatabaseError(ReservationError):
         super().__init__(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {detail}"
-        ) 
\ No newline at end of file
+        )
+
+def is_exclusion_violation(exc: IntegrityError) -> bool:
+    """Tell whether an IntegrityError comes from an EXCLUDE constraint."""
+    return getattr(exc.orig, "pgcode", None) == EXCLUSION_VIOLATION
@@ -0,0 +1,56 @@
+from pydantic import BaseModel
+from typing import List, Optional, Tuple, TypeVar
+import base64
+import binascii
+import json
+import os
+
+from app.utils.errors import InvalidCursorError
+
+# Largest page a client may ask for on the listing endpoints
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+FiltersT = TypeVar("FiltersT", bound=BaseModel)
+
+class NoFilters(BaseModel):
+    pass
+
+def encode_cursor(resource: str, after_id: int, filters: BaseModel) -> str:
+    """Build an opaque cursor that resumes a listing after ``after_id``."""
+    payload = {"r": resource, "a": after_id, "f": filters.model_dump(mode="json", exclude_none=True)}
+    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def resolve_cursor(resource: str, cursor: Optional[str], filters: FiltersT) -> Tuple[Optional[int], FiltersT]:
+    """Return the id to continue after and the filters the page applies.
+
+    A cursor remembers the filters of the listing that issued it, so clients
+    may send the cursor alone. Filters sent alongside it must match.
+    """
+    if cursor is None:
+        return None, filters
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        after_id = int(payload["a"])
+        stored = payload["f"]
+        valid = payload["r"] == resource and isinstance(stored, dict)
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        valid = False
+    if not valid:
+        raise InvalidCursorError("Malformed cursor")
+
+    requested = filters.model_dump(mode="json", exclude_none=True)
+    if any(stored.get(key) != value for key, value in requested.items()):
+        raise InvalidCursorError("Cursor was issued for different filters")
+    return after_id, type(filters).model_validate(stored)
+
+def page(resource: str, items: List, limit: int, filters: BaseModel) -> Tuple[List, Optional[str]]:
+    """Trim a ``limit + 1`` fetch to one page and build the next cursor."""
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(resource, items[-1].id, filters)
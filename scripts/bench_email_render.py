@@ -0,0 +1,57 @@
+"""Email template render throughput.
+
+Compares compiling the template from disk for every message (the previous
+EmailService behaviour) with rendering from the shared, precompiled
+environment. Rendering only; nothing is sent.
+
+    python scripts/bench_email_render.py --messages 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+from jinja2 import Template
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.email.email_service import TEMPLATE_DIR, precompile_templates, render_email
+
+CONTEXT = {
+    "guest_name": "Test Guest",
+    "unit_name": "Test Unit",
+    "check_in_date": "2024-01-01",
+    "check_out_date": "2024-01-03",
+    "reservation_id": 1,
+}
+
+def render_uncached(template_name: str) -> str:
+    with open(os.path.join(TEMPLATE_DIR, f"{template_name}.html"), "r") as f:
+        template = Template(f.read())
+    return template.render(**CONTEXT)
+
+def render_cached(template_name: str) -> str:
+    html_content, _ = render_email(template_name, CONTEXT)
+    return html_content
+
+def measure(render, messages: int) -> float:
+    started = time.perf_counter()
+    for _ in range(messages):
+        render("reservation_confirmation")
+    return messages / (time.perf_counter() - started)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    precompile_templates()
+    before = measure(render_uncached, args.messages)
+    after = measure(render_cached, args.messages)
+    print(f"{'variant':<32}{'templates/s':>12}")
+    print(f"{'compile per message':<32}{before:>12.0f}")
+    print(f"{'precompiled (html + plaintext)':<32}{after:>12.0f}")
+    print(f"speedup: {after / before:.1f}x")
+
+if __name__ == "__main__":
+    main()
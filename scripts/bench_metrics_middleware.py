@@ -0,0 +1,72 @@
+"""Per-request overhead of the metrics middleware.
+
+Serves a trivial route through httpx's in-process ASGI transport three ways:
+without middleware, with the previous BaseHTTPMiddleware implementation, and
+with MetricsMiddleware. Nothing touches the network, so the differences are
+the middleware cost.
+
+    python scripts/bench_metrics_middleware.py --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.metrics import MetricsMiddleware
+
+# The middleware this replaced, kept here for comparison
+_registry = CollectorRegistry()
+_LEGACY_COUNT = Counter('legacy_requests_total', 'Legacy request count', ['method', 'endpoint', 'status'], registry=_registry)
+_LEGACY_LATENCY = Histogram('legacy_request_latency_seconds', 'Legacy latency', ['method', 'endpoint'], registry=_registry)
+
+async def legacy_metrics_middleware(request: Request, call_next):
+    start_time = time.time()
+    response = await call_next(request)
+    duration = time.time() - start_time
+    _LEGACY_COUNT.labels(method=request.method, endpoint=request.url.path, status=response.status_code).inc()
+    _LEGACY_LATENCY.labels(method=request.method, endpoint=request.url.path).observe(duration)
+    return response
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    if variant == "legacy":
+        app.middleware("http")(legacy_metrics_middleware)
+    elif variant == "asgi":
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+async def run(variant: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=build_app(variant))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(min(requests, 200)):
+            await client.get(f"/items/{i}")
+        started = time.perf_counter()
+        for i in range(requests):
+            await client.get(f"/items/{i}")
+        return (time.perf_counter() - started) / requests
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    baseline = await run("none", args.requests)
+    print(f"{'variant':<20}{'us/request':>12}{'overhead us':>14}")
+    for variant, label in (("none", "no middleware"), ("legacy", "BaseHTTPMiddleware"), ("asgi", "MetricsMiddleware")):
+        per_request = baseline if variant == "none" else await run(variant, args.requests)
+        print(f"{label:<20}{per_request * 1e6:>12.1f}{(per_request - baseline) * 1e6:>14.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+"""SMTP send throughput: connect per message vs the pooled sessions.
+
+Starts a local aiosmtpd sink in its own process and sends the same messages with
+``aiosmtplib.send`` (a new connection, EHLO and QUIT per message, as
+EmailService used to) and with SMTPPool.
+
+On loopback a connection costs almost nothing, unlike a provider reached over
+TLS with AUTH. ``--handshake-ms`` makes the sink delay its EHLO reply to stand
+in for that setup cost.
+
+    python scripts/bench_smtp_pool.py --messages 2000 --pool-size 5 --handshake-ms 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from email.message import EmailMessage
+from typing import List
+
+import aiosmtplib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.email.smtp_pool import SMTPPool
+
+class Sink:
+    """Accepts every message; EHLO is answered after ``delay`` seconds."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        return "250 OK"
+
+def serve(port: int, handshake_ms: float) -> None:
+    from aiosmtpd.controller import Controller
+
+    controller = Controller(Sink(handshake_ms / 1000), hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        while True:
+            time.sleep(3600)
+    finally:
+        controller.stop()
+
+def build_message(n: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "reservations@example.com"
+    message["To"] = f"guest{n}@example.com"
+    message["Subject"] = "Reservation Confirmation"
+    message.set_content("Your reservation has been confirmed.")
+    return message
+
+async def connect_per_message(port: int, messages: List[EmailMessage], concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_one(message):
+        async with semaphore:
+            await aiosmtplib.send(message, hostname="127.0.0.1", port=port, use_tls=False, start_tls=False)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send_one(message) for message in messages))
+    return len(messages) / (time.perf_counter() - started)
+
+async def pooled(port: int, messages: List[EmailMessage], concurrency: int) -> float:
+    pool = SMTPPool("127.0.0.1", port, size=concurrency, max_messages_per_connection=len(messages))
+    started = time.perf_counter()
+    await asyncio.gather(*(pool.send(message) for message in messages))
+    elapsed = time.perf_counter() - started
+    await pool.close()
+    return len(messages) / elapsed
+
+async def wait_for_port(port: int) -> None:
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.05)
+            continue
+        writer.close()
+        return
+    raise RuntimeError("SMTP sink did not start")
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--handshake-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    # A separate process so the sink does not compete with the sender for the GIL
+    sink = subprocess.Popen([sys.executable, __file__, "--serve", str(port), "--handshake-ms", str(args.handshake_ms)])
+    try:
+        await wait_for_port(port)
+        # Messages are built up front so only the sending is timed
+        messages = [build_message(n) for n in range(args.messages)]
+        before = await connect_per_message(port, messages, args.pool_size)
+        after = await pooled(port, messages, args.pool_size)
+    finally:
+        sink.terminate()
+        sink.wait()
+
+    print(f"{'variant':<22}{'messages/s':>12}")
+    print(f"{'connect per message':<22}{before:>12.0f}")
+    print(f"{'pooled sessions':<22}{after:>12.0f}")
+    print(f"speedup: {after / before:.1f}x")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--serve":
+        serve(int(sys.argv[2]), float(sys.argv[4]))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Cold start import time of the API, the worker and the outbox relay.
+
+Imports each entry point in a fresh interpreter under ``python -X importtime``
+and sums the cumulative time of the modules it loads, leaving out what the
+interpreter imports on its own. Fails when the median of ``--runs`` exceeds the
+entry point's budget, or when an entry point imports a package that belongs to
+the other side (the API never loads Celery or Alembic, the worker and the relay
+never load FastAPI).
+
+    python scripts/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter
+from typing import Dict, List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Seconds each entry point may take to import, and packages it must not load
+BUDGETS = {"app.main": 3.0, "app.worker": 1.5, "app.outbox": 1.5}
+FORBIDDEN = {
+    "app.main": ("celery", "alembic"),
+    "app.worker": ("fastapi", "alembic"),
+    "app.outbox": ("fastapi", "alembic"),
+}
+
+def import_times(code: str) -> List[Tuple[str, int, int, int]]:
+    """(module, depth, self us, cumulative us) for every module ``code`` imports."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+def measure(module: str, startup: set) -> Tuple[float, Dict[str, int], set]:
+    """Seconds to import ``module``, self time per top-level package and the packages loaded."""
+    rows = [row for row in import_times(f"import {module}") if row[0] not in startup]
+    total = sum(cumulative for _, depth, _, cumulative in rows if depth == 0)
+    by_package = Counter()
+    for name, _, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    return total / 1e6, by_package, {name.split(".")[0] for name, *_ in rows}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="slowest packages to list per entry point")
+    args = parser.parse_args()
+
+    startup = {name for name, *_ in import_times("pass")}
+    failures = []
+    print(f"{'entry point':<14}{'median s':>10}{'budget s':>10}")
+    for module, budget in BUDGETS.items():
+        runs = [measure(module, startup) for _ in range(args.runs)]
+        median = statistics.median(seconds for seconds, _, _ in runs)
+        _, by_package, loaded = runs[-1]
+        print(f"{module:<14}{median:>10.3f}{budget:>10.1f}")
+        for package, self_us in by_package.most_common(args.top):
+            print(f"    {package:<28}{self_us / 1e6:>8.3f}")
+        if median > budget:
+            failures.append(f"{module} took {median:.3f}s, over its {budget}s budget")
+        for package in FORBIDDEN[module]:
+            if package in loaded:
+                failures.append(f"{module} imports {package}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
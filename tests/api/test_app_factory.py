@@ -0,0 +1,73 @@
+import os
+import pytest
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+from app import main
+from app.main import create_app
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+# Fails on any outgoing connection, then imports every entry point
+IMPORT_WITHOUT_CONNECTING = """
+import socket
+
+def refuse(*args, **kwargs):
+    raise AssertionError("connection opened during import")
+
+socket.socket.connect = refuse
+socket.create_connection = refuse
+
+import app
+app.app
+from app.main import create_app
+create_app()
+import app.worker, app.outbox
+from app.database import database
+from app.utils import cache
+assert "engine" not in vars(database) and "async_engine" not in vars(database)
+assert cache.redis_client is None
+"""
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True)
+
+def test_create_app_builds_independent_apps():
+    first, second = create_app(), create_app()
+    assert first is not second
+    paths = {route.path for route in first.routes}
+    assert {"/", "/metrics", "/api/v1/reservations/", "/cache/stats"} <= paths
+    assert paths == {route.path for route in second.routes}
+
+def test_startup_migrates_only_when_asked(redis_client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(main, "upgrade_database", lambda: calls.append("upgrade"))
+    monkeypatch.delenv("MIGRATE_ON_STARTUP", raising=False)
+    with TestClient(create_app()):
+        pass
+    assert calls == []
+
+    monkeypatch.setenv("MIGRATE_ON_STARTUP", "1")
+    with TestClient(create_app()):
+        pass
+    assert calls == ["upgrade"]
+
+def test_startup_fails_when_migrations_fail(redis_client, monkeypatch):
+    def unreachable():
+        raise OperationalError("upgrade", {}, Exception("connection refused"))
+
+    monkeypatch.setattr(main, "upgrade_database", unreachable)
+    monkeypatch.setenv("MIGRATE_ON_STARTUP", "1")
+    with pytest.raises(OperationalError):
+        with TestClient(create_app()):
+            pass
+
+def test_importing_the_app_opens_no_connections():
+    result = run_python("-c", IMPORT_WITHOUT_CONNECTING)
+    assert result.returncode == 0, result.stderr
+
+def test_cold_start_stays_within_budget():
+    # Also fails when the API imports Celery or the worker imports FastAPI
+    result = run_python(os.path.join("scripts", "bench_startup.py"), "--runs", "1")
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -1,5 +1,15 @@
 import pytest
+import base64
+import csv
+import gzip
+import io
+import json
 from datetime import date, timedelta
+from prometheus_client import REGISTRY
+from sqlalchemy import select
+from app.models.models import OutboxMessage
+from app.rollups import refresh_occupancy
+from app.utils.cache import generation_key
 
 def test_create_guest(client, sample_guest_data):
     response = client.post("/api/v1/guests/", json=sample_guest_data)
@@ -46,6 +56,11 @@ def test_create_reservation(client, sample_reservation_data):
     assert data["check_in_date"] == sample_reservation_data["check_in_date"]
     assert data["check_out_date"] == sample_reservation_data["check_out_date"]
 
+def test_create_reservation_for_missing_unit(client, sample_reservation_data):
+    response = client.post("/api/v1/reservations/", json={**sample_reservation_data, "unit_id": 999999})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Unit not found"
+
 def test_get_reservations(client, sample_reservation_data):
     # Primero creamos una reserva
     client.post("/api/v1/reservations/", json=sample_reservation_data)
@@ -93,4 +108,312 @@ def test_overlapping_reservation(client, sample_reservation_data):
     }
     response = client.post("/api/v1/reservations/", json=overlapping_data)
     assert response.status_code == 400, f"Expected 400 but got {response.status_code}: {response.json()}"
-    assert "Unit is already reserved for these dates" in response.json()["detail"] 
\ No newline at end of file
+    assert "Unit is already reserved for these dates" in response.json()["detail"]
+
+
+def test_availability(client, sample_guest_data, sample_unit_data):
+    guest_id = client.post("/api/v1/guests/", json=sample_guest_data).json()["id"]
+    unit_id = client.post("/api/v1/units/", json=sample_unit_data).json()["id"]
+    client.post("/api/v1/reservations/", json={
+        "guest_id": guest_id,
+        "unit_id": unit_id,
+        "check_in_date": "2024-04-01",
+        "check_out_date": "2024-04-05"
+    })
+    
+    response = client.get("/api/v1/availability", params={"check_in": "2024-04-03", "check_out": "2024-04-07"})
+    assert response.status_code == 200
+    assert response.json()["unit_ids"] == []
+    
+    response = client.get("/api/v1/availability", params={"check_in": "2024-04-06", "check_out": "2024-04-07"})
+    assert response.json()["unit_ids"] == [unit_id]
+    
+    response = client.get("/api/v1/availability", params={"check_in": "2024-04-06", "check_out": "2024-04-07", "capacity": 3})
+    assert response.json()["unit_ids"] == []
+
+def test_bulk_create_reservations_partial(client, sample_reservation_data):
+    guest_id = sample_reservation_data["guest_id"]
+    unit_id = sample_reservation_data["unit_id"]
+    client.post("/api/v1/reservations/", json=sample_reservation_data)
+    
+    response = client.post("/api/v1/reservations/bulk", json={
+        "mode": "partial",
+        "reservations": [
+            {"guest_id": guest_id, "unit_id": unit_id, "check_in_date": "2024-04-03", "check_out_date": "2024-04-04"},
+            {"guest_id": guest_id, "unit_id": unit_id, "check_in_date": "2024-05-01", "check_out_date": "2024-05-05"},
+            {"guest_id": guest_id, "unit_id": unit_id, "check_in_date": "2024-05-04", "check_out_date": "2024-05-06"},
+            {"guest_id": guest_id, "unit_id": unit_id + 1000, "check_in_date": "2024-06-01", "check_out_date": "2024-06-02"},
+            {"guest_id": guest_id, "unit_id": unit_id, "check_in_date": "2024-05-10", "check_out_date": "2024-05-12"}
+        ]
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert data["rejected"] == 3
+    assert [result["status"] for result in data["results"]] == ["rejected", "created", "rejected", "rejected", "created"]
+    assert data["results"][0]["error"] == "Unit is already reserved for these dates"
+    assert data["results"][3]["error"] == "Unit not found"
+    assert data["results"][1]["reservation"]["check_in_date"] == "2024-05-01"
+    
+    assert len(client.get("/api/v1/reservations/").json()) == 3
+
+def test_bulk_create_reservations_all_or_nothing(client, sample_reservation_data):
+    guest_id = sample_reservation_data["guest_id"]
+    unit_id = sample_reservation_data["unit_id"]
+    
+    response = client.post("/api/v1/reservations/bulk", json={
+        "reservations": [
+            {"guest_id": guest_id, "unit_id": unit_id, "check_in_date": "2024-05-01", "check_out_date": "2024-05-05"},
+            {"guest_id": guest_id, "unit_id": unit_id, "check_in_date": "2024-05-05", "check_out_date": "2024-05-06"}
+        ]
+    })
+    assert response.status_code == 400
+    data = response.json()
+    assert data["created"] == 0
+    assert [result["status"] for result in data["results"]] == ["skipped", "rejected"]
+    
+    assert client.get("/api/v1/reservations/").json() == []
+
+def test_create_duplicate_guest(client, sample_guest_data):
+    client.post("/api/v1/guests/", json=sample_guest_data)
+    response = client.post("/api/v1/guests/", json=sample_guest_data)
+    assert response.status_code == 400
+    assert "already exists" in response.json()["detail"]
+
+def test_import_guests_csv(client, sample_guest_data):
+    client.post("/api/v1/guests/", json=sample_guest_data)
+    
+    body = (
+        "name,email,phone\n"
+        "Renamed Guest,test@example.com,1111\n"
+        "New Guest,new@example.com,2222\n"
+        "broken line\n"
+        "Newer Guest,new@example.com,3333\n"
+    )
+    response = client.post("/api/v1/guests/import", content=body.encode(), headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    assert response.json() == {"inserted": 1, "updated": 1, "rejected": 2}
+    
+    guests = {guest["email"]: guest for guest in client.get("/api/v1/guests/").json()}
+    assert guests["test@example.com"]["name"] == "Renamed Guest"
+    assert guests["new@example.com"]["phone"] == "3333"
+
+def test_import_units_ndjson(client):
+    body = (
+        '{"name": "Suite", "description": "Ocean view", "capacity": 4}\n'
+        '{"name": "Room", "description": "Basic", "capacity": 0}\n'
+        'not json\n'
+        '{"name": "Loft", "description": "Top floor", "capacity": "2"}\n'
+    )
+    response = client.post("/api/v1/units/import?format=ndjson", content=body.encode())
+    assert response.status_code == 200
+    assert response.json() == {"inserted": 2, "updated": 0, "rejected": 2}
+    
+    response = client.post("/api/v1/units/import", content=b"name\n", headers={"Content-Type": "application/xml"})
+    assert response.status_code == 415
+
+def test_reservations_cursor_pagination(client, sample_reservation_data):
+    guest_id = sample_reservation_data["guest_id"]
+    unit_id = sample_reservation_data["unit_id"]
+    other_unit_id = client.post("/api/v1/units/", json={"name": "Other Unit", "description": "Other", "capacity": 2}).json()["id"]
+    for unit in (unit_id, other_unit_id):
+        for month in range(1, 4):
+            client.post("/api/v1/reservations/", json={
+                "guest_id": guest_id,
+                "unit_id": unit,
+                "check_in_date": f"2024-0{month}-01",
+                "check_out_date": f"2024-0{month}-05"
+            })
+    
+    response = client.get("/api/v1/reservations/", params={"unit_id": unit_id, "limit": 2})
+    first_page = response.json()
+    assert [r["unit_id"] for r in first_page] == [unit_id, unit_id]
+    cursor = response.headers["X-Next-Cursor"]
+    
+    # The cursor carries the unit_id filter
+    response = client.get("/api/v1/reservations/", params={"cursor": cursor, "limit": 2})
+    second_page = response.json()
+    assert [r["unit_id"] for r in second_page] == [unit_id]
+    assert second_page[0]["id"] > first_page[-1]["id"]
+    assert "X-Next-Cursor" not in response.headers
+    
+    response = client.get("/api/v1/reservations/", params={"cursor": cursor, "unit_id": other_unit_id})
+    assert response.status_code == 400
+    
+    response = client.get("/api/v1/guests/", params={"cursor": cursor})
+    assert response.status_code == 400
+
+def test_listing_cache_is_invalidated_by_writes(client, sample_reservation_data, redis_client):
+    unit_id = sample_reservation_data["unit_id"]
+    for month in range(1, 3):
+        client.post("/api/v1/reservations/", json={**sample_reservation_data, "check_in_date": f"2024-0{month}-01", "check_out_date": f"2024-0{month}-05"})
+    
+    first = client.get("/api/v1/reservations/", params={"unit_id": unit_id, "limit": 1})
+    cached = client.get("/api/v1/reservations/", params={"limit": 1, "unit_id": unit_id})
+    assert cached.json() == first.json()
+    assert cached.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    stale_keys = redis_client.keys("cache:reservations:v*")
+    assert len(stale_keys) == 1
+    generation = int(redis_client.get(generation_key("reservations")))
+    
+    # Poison the old entry: if it were read again the page would come back empty
+    poisoned = json.loads(redis_client.get(stale_keys[0]))
+    poisoned["v"] = {"items": [], "next_cursor": None}
+    redis_client.set(stale_keys[0], json.dumps(poisoned))
+    client.post("/api/v1/reservations/", json={**sample_reservation_data, "check_in_date": "2024-03-01", "check_out_date": "2024-03-05"})
+    assert redis_client.get(generation_key("reservations")) == str(generation + 1)
+    
+    response = client.get("/api/v1/reservations/", params={"unit_id": unit_id, "limit": 1})
+    assert response.json() == first.json()
+    response = client.get("/api/v1/reservations/", params={"unit_id": unit_id})
+    assert len(response.json()) == 3
+
+def test_read_reservations_by_ids(client, sample_reservation_data, redis_client):
+    ids = [
+        client.post("/api/v1/reservations/", json={**sample_reservation_data, "check_in_date": f"2024-0{month}-01", "check_out_date": f"2024-0{month}-05"}).json()["id"]
+        for month in range(1, 4)
+    ]
+    
+    response = client.get("/api/v1/reservations", params={"ids": f"{ids[2]},{ids[0]},999999"})
+    assert response.status_code == 200
+    assert [r["id"] for r in response.json()] == [ids[2], ids[0]]
+    assert redis_client.exists(f"cache:reservation:{ids[2]}", f"cache:reservation:{ids[0]}") == 2
+    
+    response = client.get(f"/api/v1/reservations/{ids[0]}")
+    assert response.json()["check_in_date"] == "2024-01-01"
+    assert client.get("/api/v1/reservations/999999").status_code == 404
+    
+    client.put(f"/api/v1/reservations/{ids[0]}", json={"check_in_date": "2024-06-01", "check_out_date": "2024-06-02"})
+    response = client.get("/api/v1/reservations", params={"ids": str(ids[0])})
+    assert response.json()[0]["check_in_date"] == "2024-06-01"
+    
+    assert client.get("/api/v1/reservations", params={"ids": "1,x"}).status_code == 422
+
+def test_page_size_is_bounded(client):
+    response = client.get("/api/v1/reservations/", params={"limit": 1000000})
+    assert response.status_code == 422
+
+def test_export_reservations(client, sample_reservation_data):
+    client.post("/api/v1/reservations/", json=sample_reservation_data)
+    client.post("/api/v1/reservations/", json={**sample_reservation_data, "check_in_date": "2024-06-01", "check_out_date": "2024-06-03"})
+    
+    response = client.get("/api/v1/reservations/export", params={"date_from": "2024-05-01"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["check_in_date"] for line in lines] == ["2024-06-01"]
+    
+    response = client.get("/api/v1/reservations/export", params={"format": "csv", "gzip": "true"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode())))
+    assert [row["check_in_date"] for row in rows] == ["2024-04-01", "2024-06-01"]
+    assert rows[0]["status"] == "active"
+
+def test_cache_stats(client, sample_unit_data, redis_client, monkeypatch):
+    client.post("/api/v1/units/", json=sample_unit_data)
+    client.get("/api/v1/units/")
+    client.get("/api/v1/units/")
+    
+    assert client.get("/cache/stats").status_code == 404
+    monkeypatch.setenv("ADMIN_API_KEY", "secret")
+    assert client.get("/cache/stats").status_code == 403
+    assert client.get("/cache/stats", headers={"X-Admin-Key": "wrong"}).status_code == 403
+
+    response = client.get("/cache/stats", headers={"X-Admin-Key": "secret"})
+    assert response.status_code == 200
+    units = next(n for n in response.json()["namespaces"] if n["namespace"] == "units")
+    assert units["keys"] == 1
+    assert units["bytes"] > 0
+    assert units["hits"] >= 1 and units["fills"] >= 1
+    assert 0 < units["hit_ratio"] <= 1
+
+def test_request_metrics_use_route_templates(client, sample_reservation_data):
+    def count(endpoint, status):
+        labels = {"method": "GET", "endpoint": endpoint, "status": status}
+        return REGISTRY.get_sample_value("reservation_api_requests_total", labels) or 0
+
+    def count_method(method):
+        labels = {"method": method, "endpoint": "unmatched", "status": "404"}
+        return REGISTRY.get_sample_value("reservation_api_requests_total", labels) or 0
+
+    template = "/api/v1/reservations/{reservation_id}"
+    found = count(template, "200")
+    missing = count(template, "404")
+    unmatched = count("unmatched", "404")
+
+    reservation = client.post("/api/v1/reservations/", json=sample_reservation_data).json()
+    client.get(f"/api/v1/reservations/{reservation['id']}")
+    client.get("/api/v1/reservations/999999")
+    client.get("/no/such/path/123")
+
+    assert count(template, "200") == found + 1
+    assert count(template, "404") == missing + 1
+    assert count("unmatched", "404") == unmatched + 1
+    assert REGISTRY.get_sample_value("reservation_api_requests_total", {
+        "method": "GET", "endpoint": f"/api/v1/reservations/{reservation['id']}", "status": "200"
+    }) is None
+    assert REGISTRY.get_sample_value("reservation_api_requests_in_progress", {"method": "GET"}) == 0
+
+    # Made-up methods share one label instead of creating series
+    other = count_method("other")
+    client.request("FOO", "/no/such/path/123")
+    assert count_method("other") == other + 1
+    assert REGISTRY.get_sample_value("reservation_api_requests_total", {
+        "method": "FOO", "endpoint": "unmatched", "status": "404"
+    }) is None
+
+def test_availability_calendar(client, sample_reservation_data):
+    unit_id = sample_reservation_data["unit_id"]
+    start = date.today() + timedelta(days=10)
+    client.post("/api/v1/reservations/", json=sample_reservation_data)
+    client.post("/api/v1/reservations/", json=dict(
+        sample_reservation_data,
+        check_in_date=str(start + timedelta(days=2)),
+        check_out_date=str(start + timedelta(days=4))
+    ))
+
+    def booked(params):
+        response = client.get("/api/v1/availability/calendar", params=params)
+        assert response.status_code == 200
+        body = response.json()
+        packed = base64.b64decode(body["occupancy"])
+        width = body["bytes_per_unit"]
+        assert len(packed) == width * len(body["unit_ids"])
+        return {
+            unit: [d for d in range(body["days"]) if packed[row * width + d // 8] >> (d % 8) & 1]
+            for row, unit in enumerate(body["unit_ids"])
+        }
+
+    params = {"from": str(start), "to": str(start + timedelta(days=30))}
+    assert booked(params) == {unit_id: [2, 3, 4]}
+    # Past ranges are answered from the database
+    past = {"from": sample_reservation_data["check_in_date"], "to": sample_reservation_data["check_out_date"], "unit_ids": str(unit_id)}
+    assert booked(past) == {unit_id: [0, 1, 2, 3, 4]}
+
+    assert client.get("/api/v1/availability/calendar", params={"from": str(start), "to": str(start - timedelta(days=1))}).status_code == 400
+    assert client.get("/api/v1/availability/calendar", params={"from": str(start), "to": str(start + timedelta(days=400))}).status_code == 400
+
+def test_occupancy_report(client, sample_reservation_data, db_session):
+    unit_id = sample_reservation_data["unit_id"]
+    client.post("/api/v1/reservations/", json=sample_reservation_data)
+    moved = client.post("/api/v1/reservations/", json=dict(
+        sample_reservation_data, check_in_date="2024-04-29", check_out_date="2024-05-02"
+    )).json()
+    client.put(f"/api/v1/reservations/{moved['id']}", json={"check_in_date": "2024-04-30"})
+
+    # What the worker does with the refresh tasks the relay publishes
+    for message in db_session.scalars(select(OutboxMessage).where(OutboxMessage.task_name == "refresh_occupancy")):
+        refresh_occupancy(db_session, *message.args)
+
+    def report(group_by):
+        response = client.get("/api/v1/reports/occupancy", params={"from": "2024-04-01", "to": "2024-05-31", "group_by": group_by})
+        assert response.status_code == 200
+        return {row["key"]: (row["booked_days"], row["available_days"]) for row in response.json()["rows"]}
+
+    assert report("unit") == {str(unit_id): (8, 61)}
+    assert report("month") == {"2024-04": (6, 30), "2024-05": (2, 31)}
+    by_day = report("day")
+    assert len(by_day) == 61
+    assert by_day["2024-04-29"] == (0, 1) and by_day["2024-04-30"] == (1, 1)
+
+    assert client.get("/api/v1/reports/occupancy", params={"from": "2024-04-01", "to": "2024-04-02", "group_by": "week"}).status_code == 422
@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import event, func, select
+from app.crud import async_crud
+from app.models import models
+from app.schemas import schemas
+from app.utils.availability import availability_index
+
+@pytest.mark.asyncio
+async def test_create_guest(async_db_session_factory, sample_guest_data):
+    async with async_db_session_factory() as db:
+        guest = await async_crud.create_guest(db=db, guest=schemas.GuestCreate(**sample_guest_data))
+        assert guest.id is not None
+        assert guest.email == sample_guest_data["email"]
+        
+        fetched = await async_crud.get_guest(db=db, guest_id=guest.id)
+        assert fetched.name == sample_guest_data["name"]
+
+@pytest.mark.asyncio
+async def test_create_reservation(async_db_session_factory, sample_reservation_data):
+    async with async_db_session_factory() as db:
+        reservation = await async_crud.create_reservation(
+            db=db, reservation=schemas.ReservationCreate(**sample_reservation_data)
+        )
+        assert reservation.id is not None
+        assert reservation.status == "active"
+        
+        reservations = await async_crud.get_reservations(db=db)
+        assert [r.id for r in reservations] == [reservation.id]
+
+@pytest.mark.asyncio
+async def test_create_reservation_is_one_statement(async_db_session_factory, sample_reservation_data):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async with async_db_session_factory() as db:
+        engine = db.bind.sync_engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            reservation = await async_crud.create_reservation(
+                db=db, reservation=schemas.ReservationCreate(**sample_reservation_data)
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert len(statements) == 1
+
+        # The queued email matches what the bulk path builds
+        guest = await async_crud.get_guest(db, reservation.guest_id)
+        unit = await async_crud.get_unit(db, reservation.unit_id)
+        messages = list(await db.scalars(select(models.OutboxMessage).order_by(models.OutboxMessage.id)))
+        assert [message.task_name for message in messages] == ["send_reservation_email", "refresh_occupancy"]
+        assert messages[0].args == [async_crud._confirmation_email(reservation, guest, unit)]
+        assert messages[1].args == [[async_crud._stay(reservation)]]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("field, error", [("unit_id", "Unit not found"), ("guest_id", "Guest not found")])
+async def test_create_reservation_reports_missing_rows(async_db_session_factory, sample_reservation_data, field, error):
+    async with async_db_session_factory() as db:
+        with pytest.raises(ValueError) as exc_info:
+            await async_crud.create_reservation(
+                db=db, reservation=schemas.ReservationCreate(**{**sample_reservation_data, field: 999999})
+            )
+        assert str(exc_info.value) == error
+        assert await db.scalar(select(func.count()).select_from(models.Reservation)) == 0
+        assert await db.scalar(select(func.count()).select_from(models.OutboxMessage)) == 0
+
+@pytest.mark.asyncio
+async def test_update_reservation(async_db_session_factory, sample_reservation_data):
+    async with async_db_session_factory() as db:
+        reservation = await async_crud.create_reservation(
+            db=db, reservation=schemas.ReservationCreate(**sample_reservation_data)
+        )
+        updated = await async_crud.update_reservation(
+            db=db,
+            reservation_id=reservation.id,
+            reservation_update=schemas.ReservationUpdate(
+                check_in_date=date(2024, 4, 10),
+                check_out_date=date(2024, 4, 15)
+            )
+        )
+        assert updated.check_in_date == date(2024, 4, 10)
+        assert updated.check_out_date == date(2024, 4, 15)
+
+@pytest.mark.asyncio
+async def test_overlapping_reservation(async_db_session_factory, sample_reservation_data):
+    async with async_db_session_factory() as db:
+        await async_crud.create_reservation(
+            db=db, reservation=schemas.ReservationCreate(**sample_reservation_data)
+        )
+        overlapping_data = schemas.ReservationCreate(
+            guest_id=sample_reservation_data["guest_id"],
+            unit_id=sample_reservation_data["unit_id"],
+            check_in_date=date(2024, 4, 3),
+            check_out_date=date(2024, 4, 7)
+        )
+        
+        with pytest.raises(ValueError) as exc_info:
+            await async_crud.create_reservation(db=db, reservation=overlapping_data)
+        assert "Unit is already reserved for these dates" in str(exc_info.value)
+
+@pytest.mark.asyncio
+async def test_stale_availability_index_is_rebuilt_once(async_db_session_factory, sample_reservation_data, monkeypatch):
+    availability_index.reset()
+    loads = []
+    load = async_crud.load_availability_index
+
+    async def counting_load(db):
+        loads.append(db)
+        await load(db)
+
+    monkeypatch.setattr(async_crud, "load_availability_index", counting_load)
+    check_in = date.today() + timedelta(days=30)
+    async with async_db_session_factory() as db:
+        # First lookup waits for the initial load
+        assert await async_crud.get_available_units(db, async_db_session_factory, check_in, check_in) == [sample_reservation_data["unit_id"]]
+        
+        availability_index.mark_stale()
+        results = await asyncio.gather(*[
+            async_crud.get_available_units(db, async_db_session_factory, check_in, check_in) for _ in range(10)
+        ])
+        assert all(result == [sample_reservation_data["unit_id"]] for result in results)
+        await async_crud._index_reload
+    assert len(loads) == 2
+    availability_index.reset()
+
+@pytest.mark.asyncio
+async def test_bulk_partial_survives_concurrent_conflict(async_db_session_factory, sample_reservation_data, monkeypatch):
+    find_conflicts = async_crud._find_bulk_conflicts
+    calls = []
+
+    async def racing_find_conflicts(db, items):
+        conflicts = await find_conflicts(db, items)
+        calls.append(len(items))
+        if len(calls) == 1:
+            # Another request commits an overlapping reservation after the check
+            async with async_db_session_factory() as other:
+                await async_crud.create_reservation(db=other, reservation=schemas.ReservationCreate(**sample_reservation_data))
+        return conflicts
+
+    monkeypatch.setattr(async_crud, "_find_bulk_conflicts", racing_find_conflicts)
+    items = [
+        schemas.ReservationCreate(**sample_reservation_data),
+        schemas.ReservationCreate(**{**sample_reservation_data, "check_in_date": "2024-05-01", "check_out_date": "2024-05-03"}),
+    ]
+    async with async_db_session_factory() as db:
+        results, created = await async_crud.create_reservations_bulk(db=db, reservations=items, all_or_nothing=False)
+    
+    assert len(calls) == 2
+    assert [r["status"] for r in results] == ["rejected", "created"]
+    assert results[0]["error"] == "Unit is already reserved for these dates"
+    assert [reservation.check_in_date for reservation, _, _ in created] == [date(2024, 5, 1)]
+    assert created[0][1].email == "test@example.com"
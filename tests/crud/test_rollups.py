@@ -0,0 +1,50 @@
+from datetime import date
+from sqlalchemy import select
+from app import rollups
+from app.models.models import Reservation, UnitDayOccupancy
+
+def _booked(db_session, unit_id):
+    db_session.expire_all()
+    return [row.day.day for row in db_session.scalars(
+        select(UnitDayOccupancy).where(UnitDayOccupancy.unit_id == unit_id).order_by(UnitDayOccupancy.day)
+    )]
+
+def _reserve(db_session, data, check_in, check_out, status="active"):
+    reservation = Reservation(
+        guest_id=data["guest_id"], unit_id=data["unit_id"],
+        check_in_date=check_in, check_out_date=check_out, status=status
+    )
+    db_session.add(reservation)
+    db_session.commit()
+    return reservation
+
+def test_refresh_recomputes_only_the_given_range(db_session, sample_reservation_data):
+    unit_id = sample_reservation_data["unit_id"]
+    reservation = _reserve(db_session, sample_reservation_data, date(2024, 4, 1), date(2024, 4, 3))
+    rollups.refresh_occupancy(db_session, [[unit_id, "2024-04-01", "2024-04-03"]])
+    assert _booked(db_session, unit_id) == [1, 2, 3]
+
+    # Moving the stay refreshes the old and the new range
+    reservation.check_in_date, reservation.check_out_date = date(2024, 4, 10), date(2024, 4, 11)
+    db_session.commit()
+    stays = [[unit_id, "2024-04-01", "2024-04-03"], [unit_id, "2024-04-10", "2024-04-11"]]
+    rollups.refresh_occupancy(db_session, stays)
+    # Redelivered tasks leave the same result
+    rollups.refresh_occupancy(db_session, stays)
+    assert _booked(db_session, unit_id) == [10, 11]
+
+    reservation.status = "cancelled"
+    db_session.commit()
+    rollups.refresh_occupancy(db_session, [[unit_id, "2024-04-10", "2024-04-11"]])
+    assert _booked(db_session, unit_id) == []
+
+def test_rebuild_matches_reservations(db_session, sample_reservation_data):
+    unit_id = sample_reservation_data["unit_id"]
+    _reserve(db_session, sample_reservation_data, date(2024, 4, 1), date(2024, 4, 2))
+    _reserve(db_session, sample_reservation_data, date(2024, 4, 5), date(2024, 4, 5))
+    _reserve(db_session, sample_reservation_data, date(2024, 4, 20), date(2024, 4, 22), status="cancelled")
+    db_session.add(UnitDayOccupancy(unit_id=unit_id, day=date(2024, 4, 28), reservations=1))
+    db_session.commit()
+
+    assert rollups.rebuild_occupancy(db_session) == 3
+    assert _booked(db_session, unit_id) == [1, 2, 5]
@@ -0,0 +1,97 @@
+import pytest
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy import event, select
+from app.crud import async_crud, crud
+from app.models import models
+from app.schemas import schemas
+
+# Statements each write path sends; COMMIT is not counted. Nothing may be
+# read back after the commit, including when the result's attributes are used.
+
+@contextmanager
+def counting(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+def _touch(obj, *names):
+    return [getattr(obj, name) for name in names]
+
+def test_sync_write_paths(db_session, sample_guest_data, sample_unit_data):
+    engine = db_session.get_bind()
+    with counting(engine) as statements:
+        guest = crud.create_guest(db_session, schemas.GuestCreate(**{**sample_guest_data, "email": "counted@example.com"}))
+        _touch(guest, "id", "name", "email", "phone")
+    assert len(statements) == 1
+
+    with counting(engine) as statements:
+        unit = crud.create_unit(db_session, schemas.UnitCreate(**{**sample_unit_data, "name": "Counted Unit"}))
+        _touch(unit, "id", "name", "capacity", "is_available")
+    assert len(statements) == 1
+
+    reservation_data = schemas.ReservationCreate(
+        guest_id=guest.id, unit_id=unit.id, check_in_date=date(2024, 6, 1), check_out_date=date(2024, 6, 5)
+    )
+    with counting(engine) as statements:
+        reservation = crud.create_reservation(db_session, reservation_data)
+        _touch(reservation, "id", "status", "created_at")
+    assert len(statements) == 1
+
+    # SELECT the current stay, UPDATE ... RETURNING, INSERT the outbox row
+    with counting(engine) as statements:
+        updated = crud.update_reservation(db_session, reservation.id, schemas.ReservationUpdate(check_out_date=date(2024, 6, 7)))
+        _touch(updated, "id", "check_in_date", "check_out_date", "status")
+    assert len(statements) == 3
+    assert updated.check_out_date == date(2024, 6, 7)
+
+    # UPDATE ... FROM ... RETURNING, INSERT both outbox rows
+    with counting(engine) as statements:
+        cancelled = crud.cancel_reservation(db_session, reservation.id)
+        _touch(cancelled, "id", "status", "check_in_date")
+    assert len(statements) == 2
+    assert cancelled.status == "cancelled"
+
+    email = db_session.scalars(
+        select(models.OutboxMessage).where(models.OutboxMessage.task_name == "send_reservation_email")
+        .order_by(models.OutboxMessage.id.desc())
+    ).first()
+    assert email.args[0]["template_name"] == "reservation_cancellation"
+    assert email.args[0]["to_email"] == "counted@example.com"
+    assert email.args[0]["context"]["check_out_date"] == "2024-06-07"
+
+@pytest.mark.asyncio
+async def test_async_write_paths(async_db_session_factory, sample_reservation_data):
+    async with async_db_session_factory() as db:
+        engine = db.bind.sync_engine
+        with counting(engine) as statements:
+            reservation = await async_crud.create_reservation(db, schemas.ReservationCreate(**sample_reservation_data))
+            _touch(reservation, "id", "status", "created_at")
+        assert len(statements) == 1
+
+        with counting(engine) as statements:
+            updated = await async_crud.update_reservation(
+                db, reservation.id, schemas.ReservationUpdate(check_in_date=date(2024, 4, 2))
+            )
+            _touch(updated, "id", "check_in_date", "check_out_date", "status")
+        assert len(statements) == 3
+        assert updated.check_in_date == date(2024, 4, 2)
+
+        with counting(engine) as statements:
+            cancelled = await async_crud.cancel_reservation(db, reservation.id)
+            _touch(cancelled, "id", "status")
+        assert len(statements) == 2
+        assert cancelled.status == "cancelled"
+
+def test_update_reports_missing_guest(db_session, sample_reservation_data):
+    reservation = crud.create_reservation(db_session, schemas.ReservationCreate(**sample_reservation_data))
+    with pytest.raises(ValueError, match="Guest not found"):
+        crud.update_reservation(db_session, reservation.id, schemas.ReservationUpdate(guest_id=999999))
+    assert crud.get_reservation(db_session, reservation.id).guest_id == sample_reservation_data["guest_id"]
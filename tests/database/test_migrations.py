@@ -0,0 +1,75 @@
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+from app.database.database import Base
+from app.database.migrate import alembic_config, upgrade_database
+
+HEAD = "0002_reservation_indexes"
+NEW_INDEXES = {"ix_reservations_guest_id", "ix_reservations_unit_id", "ix_reservations_active_unit_dates"}
+
+@pytest.fixture
+def empty_database(recreate_database):
+    url = recreate_database("reservations_migrations_test")
+    engine = create_engine(url)
+    yield url, engine
+    engine.dispose()
+
+def _revision(engine):
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+def _reservation_indexes(engine):
+    return {index["name"] for index in inspect(engine).get_indexes("reservations")}
+
+def test_migrations_build_the_model_schema(empty_database):
+    url, engine = empty_database
+    upgrade_database(url)
+    assert _revision(engine) == HEAD
+    with engine.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), Base.metadata) == []
+        assert connection.scalar(text(
+            "SELECT count(*) FROM pg_constraint WHERE conname = 'reservations_unit_dates_excl'"
+        )) == 1
+
+def test_database_built_by_create_all_is_adopted(empty_database):
+    url, engine = empty_database
+    # The schema as create_all left it before the constraint and the indexes
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE reservations DROP CONSTRAINT reservations_unit_dates_excl"))
+        for name in NEW_INDEXES:
+            connection.execute(text(f"DROP INDEX {name}"))
+        connection.execute(text("INSERT INTO guests (name, email) VALUES ('Kept', 'kept@example.com')"))
+
+    upgrade_database(url)
+    assert _revision(engine) == HEAD
+    assert NEW_INDEXES <= _reservation_indexes(engine)
+    with engine.connect() as connection:
+        assert connection.scalar(text("SELECT email FROM guests")) == "kept@example.com"
+        assert connection.scalar(text(
+            "SELECT count(*) FROM pg_constraint WHERE conname = 'reservations_unit_dates_excl'"
+        )) == 1
+
+def test_overlapping_reservations_block_the_upgrade(empty_database):
+    url, engine = empty_database
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE reservations DROP CONSTRAINT reservations_unit_dates_excl"))
+        connection.execute(text("INSERT INTO units (id, name) VALUES (1, 'Unit')"))
+        connection.execute(text(
+            "INSERT INTO reservations (unit_id, check_in_date, check_out_date, status) VALUES "
+            "(1, '2024-04-01', '2024-04-05', 'active'), (1, '2024-04-03', '2024-04-07', 'active')"
+        ))
+    with pytest.raises(IntegrityError):
+        upgrade_database(url)
+
+def test_index_migration_downgrades(empty_database):
+    url, engine = empty_database
+    upgrade_database(url)
+    command.downgrade(alembic_config(url), "0001_baseline")
+    assert not NEW_INDEXES & _reservation_indexes(engine)
+    upgrade_database(url)
+    assert NEW_INDEXES <= _reservation_indexes(engine)
@@ -0,0 +1,153 @@
+"""EXPLAIN the statements the hot crud paths send, at realistic table sizes.
+
+Each test runs a crud function against a migrated database holding 45k
+reservations, records the SQL it sends and fails if the plan of any of those
+statements reads a large table with a sequential scan.
+"""
+import pytest
+from contextlib import contextmanager
+from datetime import date
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app import rollups
+from app.crud import async_crud, crud
+from app.database.migrate import upgrade_database
+from app.schemas import schemas
+
+UNITS = 300
+GUESTS = 10000
+STAYS_PER_UNIT = 150
+
+# Units are few enough that scanning them is the right plan
+LARGE_TABLES = {"reservations", "guests", "unit_day_occupancy"}
+
+SEED = [
+    f"""INSERT INTO units (name, capacity, is_available)
+        SELECT 'Unit ' || n, 1 + n % 6, true FROM generate_series(1, {UNITS}) n""",
+    f"""INSERT INTO guests (name, email, phone)
+        SELECT 'Guest ' || n, 'guest' || n || '@example.com', '555-0100' FROM generate_series(1, {GUESTS}) n""",
+    # Two-night stays every five days per unit from 2020 on; one in ten cancelled
+    f"""INSERT INTO reservations (guest_id, unit_id, check_in_date, check_out_date, status)
+        SELECT 1 + (u * {STAYS_PER_UNIT} + k) % {GUESTS}, u,
+               date '2020-01-01' + k * 5 + u % 3, date '2020-01-01' + k * 5 + u % 3 + 2,
+               CASE WHEN k % 10 = 0 THEN 'cancelled' ELSE 'active' END
+        FROM generate_series(1, {UNITS}) u, generate_series(0, {STAYS_PER_UNIT - 1}) k""",
+]
+
+@pytest.fixture(scope="module")
+def plans_engine(recreate_database):
+    url = recreate_database("reservations_plans_test")
+    upgrade_database(url)
+    engine = create_engine(url, poolclass=NullPool)
+    with engine.begin() as connection:
+        for statement in SEED:
+            connection.execute(text(statement))
+    with sessionmaker(bind=engine)() as db:
+        rollups.rebuild_occupancy(db)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("ANALYZE"))
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(plans_engine):
+    with sessionmaker(bind=plans_engine, expire_on_commit=False)() as session:
+        yield session
+
+@pytest.fixture
+def async_session_factory(plans_engine):
+    # NullPool: every asyncio test runs its own event loop
+    engine = create_async_engine(plans_engine.url.set(drivername="postgresql+asyncpg"), poolclass=NullPool)
+    return async_sessionmaker(bind=engine, expire_on_commit=False)
+
+@contextmanager
+def recorded(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+def _nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+def _sequential_scans(plan) -> list:
+    return [
+        node["Relation Name"] for node in _nodes(plan)
+        if node["Node Type"] == "Seq Scan" and node["Relation Name"] in LARGE_TABLES
+    ]
+
+def assert_no_sequential_scans(engine, statements):
+    assert statements
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()[0]["Plan"]
+            assert _sequential_scans(plan) == [], statement
+
+async def assert_no_async_sequential_scans(db, statements):
+    assert statements
+    connection = await db.connection()
+    for statement, parameters in statements:
+        plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)).scalar()
+        assert _sequential_scans(plan[0]["Plan"]) == [], statement
+
+def test_overlap_check(db, plans_engine):
+    with recorded(plans_engine) as statements:
+        crud.has_overlapping_reservation(db, 250, date(2021, 6, 1), date(2021, 6, 4))
+    assert_no_sequential_scans(plans_engine, statements)
+
+def test_reservation_writes(db, plans_engine):
+    with recorded(plans_engine) as statements:
+        reservation = crud.create_reservation(db, schemas.ReservationCreate(
+            guest_id=42, unit_id=250, check_in_date=date(2031, 1, 1), check_out_date=date(2031, 1, 3)
+        ))
+        crud.update_reservation(db, reservation.id, schemas.ReservationUpdate(check_out_date=date(2031, 1, 4)))
+        crud.cancel_reservation(db, reservation.id)
+    assert_no_sequential_scans(plans_engine, statements)
+
+@pytest.mark.parametrize("filters", [
+    schemas.ReservationFilters(guest_id=42),
+    schemas.ReservationFilters(unit_id=250, status="active"),
+    schemas.ReservationFilters(unit_id=250, date_from=date(2021, 1, 1), date_to=date(2021, 1, 31)),
+])
+def test_reservation_listings(db, plans_engine, filters):
+    with recorded(plans_engine) as statements:
+        crud.get_reservations(db, limit=100, filters=filters)
+        crud.get_reservation(db, 12345)
+    assert_no_sequential_scans(plans_engine, statements)
+
+def test_occupancy_refresh(db, plans_engine):
+    with recorded(plans_engine) as statements:
+        rollups.refresh_occupancy(db, [[250, "2021-01-01", "2021-01-31"]])
+    assert_no_sequential_scans(plans_engine, statements)
+
+@pytest.mark.asyncio
+async def test_availability_and_reports(async_session_factory):
+    async with async_session_factory() as db:
+        with recorded(db.bind.sync_engine) as statements:
+            await async_crud._query_available_units(db, date(2021, 6, 1), date(2021, 6, 4), 1)
+            await async_crud._query_calendar(db, date(2021, 6, 1), 30, [1, 2, 3])
+            await async_crud.get_occupancy_report(db, date(2021, 6, 1), date(2021, 6, 30), "unit")
+            await async_crud.get_reservations_by_ids(db, [1, 500, 99999])
+        await assert_no_async_sequential_scans(db, statements)
+
+@pytest.mark.asyncio
+async def test_bulk_conflict_check(async_session_factory):
+    items = [
+        (idx, schemas.ReservationCreate(guest_id=1, unit_id=unit_id, check_in_date=date(2021, 6, 1), check_out_date=date(2021, 6, 3)))
+        for idx, unit_id in enumerate(range(1, 50))
+    ]
+    async with async_session_factory() as db:
+        with recorded(db.bind.sync_engine) as statements:
+            await async_crud._find_bulk_conflicts(db, items)
+        await assert_no_async_sequential_scans(db, statements)
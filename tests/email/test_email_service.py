@@ -0,0 +1,42 @@
+import pytest
+from email import message_from_bytes
+from app.email.email_service import EmailService, precompile_templates, render_email, template_env
+
+CONTEXT = {
+    "guest_name": "Ana <b>& Co</b>",
+    "unit_name": "Cabin 1",
+    "check_in_date": "2024-01-01",
+    "check_out_date": "2024-01-03",
+    "reservation_id": 7,
+}
+
+def test_templates_are_compiled_once(monkeypatch):
+    assert precompile_templates() >= 2
+    compiled = template_env.get_template("reservation_confirmation.html")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("templates must not be loaded again")
+
+    monkeypatch.setattr(template_env.loader, "get_source", fail)
+    assert template_env.get_template("reservation_confirmation.html") is compiled
+    render_email("reservation_confirmation", CONTEXT)
+
+def test_html_is_escaped_and_plaintext_is_not():
+    html_content, text_content = render_email("reservation_confirmation", CONTEXT)
+    assert "Ana &lt;b&gt;&amp; Co&lt;/b&gt;" in html_content
+    assert "Dear Ana <b>& Co</b>," in text_content
+    assert "Reservation ID: 7" in text_content
+
+@pytest.mark.asyncio
+async def test_send_email_attaches_both_alternatives(smtp_sink, monkeypatch):
+    monkeypatch.setenv("SMTP_HOST", "127.0.0.1")
+    monkeypatch.setenv("SMTP_PORT", str(smtp_sink.port))
+    service = EmailService()
+    await service.send_email("ana@example.com", "Confirmed", "reservation_confirmation", CONTEXT)
+    await service.send_email("ana@example.com", "Confirmed", "reservation_confirmation", CONTEXT)
+    await service.close()
+
+    message = message_from_bytes(smtp_sink.messages[0])
+    assert [part.get_content_type() for part in message.get_payload()] == ["text/plain", "text/html"]
+    # Both messages went over one pooled session
+    assert len(smtp_sink.messages) == 2 and len(smtp_sink.sessions) == 1
@@ -0,0 +1,52 @@
+import asyncio
+import time
+import aiosmtplib
+import pytest
+from email.message import EmailMessage
+from app.email.smtp_pool import SMTPPool, TokenBucket
+
+def _message(n):
+    message = EmailMessage()
+    message["From"] = "reservations@example.com"
+    message["To"] = f"guest{n}@example.com"
+    message["Subject"] = f"Message {n}"
+    message.set_content("hello")
+    return message
+
+@pytest.mark.asyncio
+async def test_sessions_are_reused_and_bounded(smtp_sink):
+    pool = SMTPPool("127.0.0.1", smtp_sink.port, size=3)
+    await asyncio.gather(*(pool.send(_message(n)) for n in range(30)))
+    await pool.close()
+    assert len(smtp_sink.messages) == 30
+    assert 1 <= len(smtp_sink.sessions) <= 3
+
+@pytest.mark.asyncio
+async def test_sessions_are_recycled_after_max_messages(smtp_sink):
+    pool = SMTPPool("127.0.0.1", smtp_sink.port, size=1, max_messages_per_connection=4)
+    for n in range(10):
+        await pool.send(_message(n))
+    await pool.close()
+    assert len(smtp_sink.sessions) == 3
+
+@pytest.mark.asyncio
+async def test_reconnects_when_the_session_drops(smtp_sink):
+    pool = SMTPPool("127.0.0.1", smtp_sink.port, size=1)
+    await pool.send(_message(1))
+    # The server dropped the idle session without the pool noticing
+    async def disconnected(message):
+        raise aiosmtplib.SMTPServerDisconnected("gone")
+
+    pool._idle[0].send_message = disconnected
+    await pool.send(_message(2))
+    await pool.close()
+    assert len(smtp_sink.messages) == 2 and len(smtp_sink.sessions) == 2
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, burst=5)
+    started = time.monotonic()
+    for _ in range(15):
+        await bucket.acquire()
+    # 5 tokens up front, the other 10 arrive at 50/s
+    assert time.monotonic() - started >= 0.18
@@ -1,6 +1,8 @@
 import pytest
 from datetime import date
+from sqlalchemy.exc import IntegrityError
 from app.models import models
+from app.utils.errors import is_exclusion_violation
 
 def test_guest_model(db_session):
     guest = models.Guest(
@@ -101,4 +103,32 @@ def test_reservation_relationships(db_session):
     assert reservation.guest == guest
     assert reservation.unit == unit
     assert reservation in guest.reservations
-    assert reservation in unit.reservations 
\ No newline at end of file
+    assert reservation in unit.reservations
+
+def test_overlapping_active_reservations_are_excluded(db_session):
+    guest = models.Guest(name="Test Guest", email="test@example.com", phone="1234567890")
+    unit = models.Unit(name="Test Unit", description="Test Description", capacity=2)
+    db_session.add_all([guest, unit])
+    db_session.commit()
+    
+    db_session.add(models.Reservation(
+        guest_id=guest.id, unit_id=unit.id,
+        check_in_date=date(2024, 4, 1), check_out_date=date(2024, 4, 5)
+    ))
+    db_session.commit()
+    
+    # A cancelled reservation does not take part in the constraint
+    db_session.add(models.Reservation(
+        guest_id=guest.id, unit_id=unit.id, status="cancelled",
+        check_in_date=date(2024, 4, 2), check_out_date=date(2024, 4, 3)
+    ))
+    db_session.commit()
+    
+    db_session.add(models.Reservation(
+        guest_id=guest.id, unit_id=unit.id,
+        check_in_date=date(2024, 4, 5), check_out_date=date(2024, 4, 7)
+    ))
+    with pytest.raises(IntegrityError) as exc_info:
+        db_session.commit()
+    db_session.rollback()
+    assert is_exclusion_violation(exc_info.value)
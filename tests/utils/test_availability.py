@@ -0,0 +1,97 @@
+from datetime import date
+from app.utils.availability import AvailabilityIndex
+
+def _index():
+    index = AvailabilityIndex()
+    journal = index.begin_load()
+    index.finish_load(
+        journal,
+        units=[(1, 2, True), (2, 4, True), (3, 6, False)],
+        reservations=[
+            (10, 1, date(2024, 4, 1), date(2024, 4, 5)),
+            (11, 1, date(2024, 4, 10), date(2024, 4, 12)),
+            (12, 2, date(2024, 4, 3), date(2024, 4, 4)),
+        ]
+    )
+    return index
+
+def test_available_units_respects_overlap_and_capacity():
+    index = _index()
+    assert index.available_units(date(2024, 4, 6), date(2024, 4, 9)) == [1, 2]
+    assert index.available_units(date(2024, 4, 2), date(2024, 4, 3)) == []
+    assert index.available_units(date(2024, 4, 6), date(2024, 4, 9), capacity=3) == [2]
+
+def test_touching_dates_overlap_like_crud():
+    index = _index()
+    assert not index.is_available(1, date(2024, 4, 5), date(2024, 4, 8))
+    assert index.is_available(1, date(2024, 4, 6), date(2024, 4, 9))
+
+def test_nested_interval_is_detected():
+    index = AvailabilityIndex()
+    index.finish_load(index.begin_load(), units=[(1, 2, True)], reservations=[])
+    index.upsert_reservation(1, 1, date(2024, 1, 1), date(2024, 1, 31))
+    index.upsert_reservation(2, 1, date(2024, 1, 10), date(2024, 1, 11))
+    assert not index.is_available(1, date(2024, 1, 20), date(2024, 1, 21))
+
+def test_updates_and_cancellations_move_intervals():
+    index = _index()
+    index.upsert_reservation(10, 1, date(2024, 5, 1), date(2024, 5, 3))
+    assert index.is_available(1, date(2024, 4, 2), date(2024, 4, 3))
+    assert not index.is_available(1, date(2024, 5, 2), date(2024, 5, 2))
+    
+    index.upsert_reservation(10, 1, date(2024, 5, 1), date(2024, 5, 3), status="cancelled")
+    assert index.is_available(1, date(2024, 5, 2), date(2024, 5, 2))
+
+def test_writes_during_load_are_replayed():
+    index = AvailabilityIndex()
+    journal = index.begin_load()
+    index.upsert_unit(5, 2)
+    index.upsert_reservation(20, 5, date(2024, 4, 1), date(2024, 4, 2))
+    index.finish_load(journal, units=[], reservations=[])
+    assert index.available_units(date(2024, 4, 1), date(2024, 4, 1)) == []
+    assert index.available_units(date(2024, 4, 3), date(2024, 4, 4)) == [5]
+
+def test_load_sorts_intervals_and_respects_horizon():
+    index = AvailabilityIndex()
+    index.finish_load(
+        index.begin_load(),
+        units=[(1, 2, True)],
+        reservations=[
+            (2, 1, date(2024, 6, 10), date(2024, 6, 12)),
+            (1, 1, date(2024, 6, 1), date(2024, 6, 30)),
+        ],
+        horizon=date(2024, 6, 1)
+    )
+    assert not index.is_available(1, date(2024, 6, 20), date(2024, 6, 21))
+    assert index.covers(date(2024, 6, 1))
+    assert not index.covers(date(2024, 5, 31))
+
+def _booked_days(index, first, days, unit_ids=None):
+    unit_ids, packed = index.calendar(first, days, unit_ids)
+    width = -(-days // 8)
+    return {
+        unit_id: [d for d in range(days) if packed[row * width + d // 8] >> (d % 8) & 1]
+        for row, unit_id in enumerate(unit_ids)
+    }
+
+def test_calendar_bitmaps_follow_writes():
+    index = _index()
+    # Unit 3 is not bookable and is left out unless asked for
+    assert _booked_days(index, date(2024, 3, 30), 16) == {
+        1: [2, 3, 4, 5, 6, 11, 12, 13],
+        2: [4, 5],
+    }
+    index.upsert_reservation(10, 1, date(2024, 4, 20), date(2024, 4, 21))
+    index.upsert_reservation(11, 1, date(2024, 4, 10), date(2024, 4, 12), status="cancelled")
+    index.upsert_reservation(13, 3, date(2024, 3, 1), date(2024, 3, 31))
+    assert _booked_days(index, date(2024, 3, 30), 24, unit_ids=[1, 3, 99]) == {
+        1: [21, 22],
+        3: [0, 1],
+        99: [],
+    }
+
+def test_calendar_window_is_packed_lsb_first():
+    index = _index()
+    unit_ids, packed = index.calendar(date(2024, 4, 1), 9, unit_ids=[1])
+    # April 1-5 booked: bits 0-4 of the first byte, nothing in the second
+    assert packed == bytes([0b00011111, 0])
@@ -0,0 +1,315 @@
+import asyncio
+import json
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+import time
+from redis import RedisError
+from app.utils import cache
+from app.utils.cache import (
+    LocalCache, cache_key, cached, evict_items, generation_key, get_items, invalidate_cache, item_key
+)
+
+def test_cache_key_ignores_parameter_order():
+    assert cache_key("guests", 1, {"skip": 0, "limit": 10}) == cache_key("guests", 1, {"limit": 10, "skip": 0})
+    assert cache_key("guests", 1, {"skip": 0}) != cache_key("guests", 2, {"skip": 0})
+    assert cache_key("guests", 1, {"skip": 0}) != cache_key("units", 1, {"skip": 0})
+
+@pytest.mark.asyncio
+async def test_cached_hits_until_generation_is_bumped(redis_client):
+    calls = []
+
+    @cached("guests", ttl=60)
+    async def load(skip: int, limit: int = 10):
+        calls.append((skip, limit))
+        return {"items": [skip, limit]}
+
+    @invalidate_cache("guests")
+    async def write():
+        return "ok"
+
+    assert await load(0) == {"items": [0, 10]}
+    assert await load(skip=0, limit=10) == {"items": [0, 10]}
+    assert calls == [(0, 10)]
+
+    assert await write() == "ok"
+    assert redis_client.get(generation_key("guests")) == "1"
+    await load(0)
+    assert calls == [(0, 10), (0, 10)]
+
+@pytest.mark.asyncio
+async def test_invalidation_uses_no_key_scans(redis_client, monkeypatch):
+    @invalidate_cache("reservations", "units")
+    async def write():
+        return None
+
+    def fail(*args, **kwargs):
+        raise AssertionError("KEYS must not be used")
+
+    monkeypatch.setattr(cache.redis_client, "keys", fail)
+    await write()
+    assert redis_client.get(generation_key("reservations")) == "1"
+    assert redis_client.get(generation_key("units")) == "1"
+
+@pytest.mark.asyncio
+async def test_cached_falls_back_when_redis_is_down(monkeypatch):
+    class DownRedis:
+        async def get(self, key):
+            raise RedisError("down")
+
+    monkeypatch.setattr(cache, "redis_client", DownRedis())
+
+    @cached("units", ttl=60)
+    async def load(unit_id: int):
+        return unit_id
+
+    assert await load(3) == 3
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(max_entries=2, max_bytes=1024)
+    local.set("a", "1", ttl=60)
+    local.set("b", "2", ttl=60)
+    assert local.get("a") == "1"
+    local.set("c", "3", ttl=60)
+    assert local.get("b") is None
+    assert local.get("a") == "1" and local.get("c") == "3"
+
+def test_local_cache_respects_byte_budget_and_ttl(monkeypatch):
+    local = LocalCache(max_entries=10, max_bytes=10)
+    local.set("a", "x" * 6, ttl=60)
+    local.set("b", "y" * 6, ttl=60)
+    assert local.get("a") is None
+    assert local.size_bytes == 6
+    local.set("big", "z" * 11, ttl=60)
+    assert local.get("big") is None
+    
+    now = time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 61)
+    assert local.get("b") is None
+    assert len(local) == 0
+
+async def _wait_for(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+@pytest.mark.asyncio
+async def test_warm_reads_skip_redis_while_subscribed(redis_client, monkeypatch):
+    cache.start_invalidation_listener()
+    try:
+        await _wait_for(lambda: cache._generations.subscribed)
+        
+        @cached("units", ttl=60)
+        async def load(limit: int):
+            return [limit]
+
+        await load(5)
+        gets = []
+        original_get = cache.redis_client.get
+
+        async def counting_get(key):
+            gets.append(key)
+            return await original_get(key)
+
+        monkeypatch.setattr(cache.redis_client, "get", counting_get)
+        assert await load(5) == [5]
+        assert gets == []
+        
+        # Another worker invalidates: the message updates the generation here
+        redis_client.incr(generation_key("units"))
+        redis_client.publish(cache.INVALIDATION_CHANNEL, json.dumps({"namespace": "units", "generation": 1}))
+        await _wait_for(lambda: cache._generations.get("units") == 1)
+        assert len(cache.local_cache) == 0
+        await load(5)
+        assert gets == [cache_key("units", 1, {"limit": 5})]
+    finally:
+        await cache.stop_invalidation_listener()
+
+class _Item:
+    def __init__(self, id):
+        self.id = id
+
+@pytest.mark.asyncio
+async def test_get_items_uses_one_mget_and_backfills_misses(redis_client, monkeypatch):
+    loads = []
+
+    async def load(ids):
+        loads.append(ids)
+        return [{"id": item_id} for item_id in ids if item_id != 4]
+
+    redis_client.set(item_key("thing", 1), json.dumps({"id": 1, "cached": True}))
+    found = await get_items("thing", [1, 2, 3, 4], load, ttl=60)
+    assert found == {1: {"id": 1, "cached": True}, 2: {"id": 2}, 3: {"id": 3}}
+    assert loads == [[2, 3, 4]]
+    assert redis_client.ttl(item_key("thing", 2)) > 0
+    
+    # Everything found is now cached; the missing id is looked up again
+    mgets = []
+    original_mget = cache.redis_client.mget
+
+    async def counting_mget(keys):
+        mgets.append(keys)
+        return await original_mget(keys)
+
+    monkeypatch.setattr(cache.redis_client, "mget", counting_mget)
+    cache.local_cache.clear()
+    assert set(await get_items("thing", [1, 2, 3, 4], load, ttl=60)) == {1, 2, 3}
+    assert len(mgets) == 1
+    assert loads == [[2, 3, 4], [4]]
+    
+    await evict_items("thing", [2])
+    assert redis_client.get(item_key("thing", 2)) is None
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_load_once(redis_client):
+    calls = []
+
+    @cached("units", ttl=60)
+    async def load(limit: int):
+        calls.append(limit)
+        await asyncio.sleep(0.05)
+        return [limit]
+
+    results = await asyncio.gather(*[load(7) for _ in range(20)])
+    assert results == [[7]] * 20
+    assert calls == [7]
+    assert redis_client.get(f"cache:lock:{cache_key('units', 0, {'limit': 7})}") is None
+
+@pytest.mark.asyncio
+async def test_waits_for_another_workers_load(redis_client):
+    key = cache_key("units", 0, {"limit": 3})
+    redis_client.set(f"cache:lock:{key}", "other-worker", px=5000)
+    calls = []
+
+    @cached("units", ttl=60)
+    async def load(limit: int):
+        calls.append(limit)
+        return ["mine"]
+
+    async def other_worker_fills():
+        await asyncio.sleep(0.1)
+        redis_client.set(key, json.dumps({"v": ["theirs"], "d": 0.1, "e": time.time() + 60}))
+
+    result, _ = await asyncio.gather(load(3), other_worker_fills())
+    assert result == ["theirs"]
+    assert calls == []
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_served_while_refreshing(redis_client):
+    calls = []
+
+    @cached("units", ttl=60, stale_ttl=30)
+    async def load(limit: int):
+        calls.append(limit)
+        return [len(calls)]
+
+    key = cache_key("units", 0, {"limit": 1})
+    redis_client.set(key, json.dumps({"v": ["stale"], "d": 0.01, "e": time.time() - 5}))
+    assert await load(1) == ["stale"]
+    await asyncio.gather(*cache._refreshes.values())
+    assert calls == [1]
+    cache.local_cache.clear()
+    assert await load(1) == [1]
+
+@pytest.mark.asyncio
+async def test_early_refresh_starts_before_expiry(redis_client, monkeypatch):
+    calls = []
+
+    @cached("units", ttl=60, early_refresh=1.0)
+    async def load(limit: int):
+        calls.append(limit)
+        return ["fresh"]
+
+    key = cache_key("units", 0, {"limit": 2})
+    # Two seconds left on a value that took one second to compute
+    redis_client.set(key, json.dumps({"v": ["old"], "d": 1.0, "e": time.time() + 2}))
+    monkeypatch.setattr(cache.random, "random", lambda: 0.5)
+    assert await load(2) == ["old"]
+    assert calls == []
+    
+    cache.local_cache.clear()
+    monkeypatch.setattr(cache.random, "random", lambda: 0.99)
+    assert await load(2) == ["old"]
+    await asyncio.gather(*cache._refreshes.values())
+    assert calls == [2]
+
+@pytest.mark.asyncio
+async def test_background_refresh_uses_its_own_session(redis_client, async_db_session_factory):
+    sessions = []
+
+    @cached("units", ttl=60, stale_ttl=30)
+    async def load(db, limit: int):
+        sessions.append(db)
+        return (await db.execute(text("SELECT CAST(:limit AS integer)"), {"limit": limit})).scalar()
+
+    key = cache_key("units", 0, {"limit": 4})
+    redis_client.set(key, json.dumps({"v": 0, "d": 0.01, "e": time.time() - 1}))
+    async with async_db_session_factory() as db:
+        assert await load(db, 4) == 0
+    # The request session is closed; the refresh still succeeds
+    await asyncio.gather(*cache._refreshes.values())
+    assert len(sessions) == 1 and sessions[0] is not db
+    assert json.loads(redis_client.get(key))["v"] == 4
+
+@pytest.mark.asyncio
+async def test_hits_and_misses_are_counted(redis_client):
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    hits = sample("reservation_cache_hits_total", cache_type="stats_test", tier="local")
+    misses = sample("reservation_cache_misses_total", cache_type="stats_test")
+
+    @cached("stats_test", ttl=60)
+    async def load(limit: int):
+        return [limit]
+
+    await load(1)
+    await load(1)
+    assert sample("reservation_cache_misses_total", cache_type="stats_test") == misses + 1
+    assert sample("reservation_cache_hits_total", cache_type="stats_test", tier="local") == hits + 1
+    assert cache.cache_stats.snapshot()["stats_test"]["fill"] == 1
+    assert (await cache.namespace_stats("stats_test"))["keys"] == 1
+
+@pytest.mark.asyncio
+async def test_misses_do_not_join_a_refresh_that_gives_up(redis_client):
+    calls = []
+
+    @cached("units", ttl=60, stale_ttl=30)
+    async def load(limit: int):
+        calls.append(limit)
+        return ["fresh"]
+
+    key = cache_key("units", 0, {"limit": 5})
+    redis_client.set(key, json.dumps({"v": ["stale"], "d": 0.01, "e": time.time() - 5}))
+    # Another worker is refreshing this key, so the local refresh gives up
+    redis_client.set(f"cache:lock:{key}", "other-worker", px=200)
+    assert await load(5) == ["stale"]
+    assert key in cache._refreshes and key not in cache._inflight
+
+    # The entry is gone before the refresh finishes; the miss loads the value
+    redis_client.delete(key)
+    cache.local_cache.clear()
+    assert await load(5) == ["fresh"]
+    assert await asyncio.gather(*cache._refreshes.values()) in ([], [None])
+
+@pytest.mark.asyncio
+async def test_shared_miss_survives_the_first_callers_cancellation(redis_client, async_db_session_factory):
+    started = asyncio.Event()
+
+    @cached("units", ttl=60)
+    async def load(db, limit: int):
+        started.set()
+        return (await db.execute(text("SELECT CAST(:limit AS integer) FROM pg_sleep(0.2)"), {"limit": limit})).scalar()
+
+    first_db = async_db_session_factory()
+    first = asyncio.create_task(load(first_db, 6))
+    await started.wait()
+    async with async_db_session_factory() as second_db:
+        second = asyncio.create_task(load(second_db, 6))
+        await asyncio.sleep(0.01)
+        # The first request is cancelled and its dependency closes the session
+        first.cancel()
+        await first_db.close()
+        assert await second == 6
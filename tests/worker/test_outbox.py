@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import outbox
+from app.models.models import OutboxMessage
+
+@pytest.fixture
+def published(monkeypatch):
+    sent = []
+
+    def send_task(name, args=None, task_id=None, producer=None, **kwargs):
+        assert producer is not None
+        sent.append((name, args, task_id))
+
+    monkeypatch.setattr(outbox.celery_app, "send_task", send_task)
+    return sent
+
+def _queue(db, count):
+    db.add_all([OutboxMessage(task_name="send_reservation_email", args=[{"n": n}]) for n in range(count)])
+    db.commit()
+
+def test_reservation_and_email_are_written_together(client, sample_reservation_data, db_session):
+    response = client.post("/api/v1/reservations/", json=sample_reservation_data)
+    messages = db_session.scalars(select(OutboxMessage).order_by(OutboxMessage.id)).all()
+    assert [message.task_name for message in messages] == ["send_reservation_email", "refresh_occupancy"]
+    assert messages[0].args[0]["context"]["reservation_id"] == response.json()["id"]
+
+    # A rejected reservation queues nothing
+    assert client.post("/api/v1/reservations/", json=sample_reservation_data).status_code == 400
+    db_session.expire_all()
+    assert len(db_session.scalars(select(OutboxMessage)).all()) == 2
+
+def test_bulk_create_queues_one_task(client, sample_reservation_data, db_session):
+    second = dict(sample_reservation_data, check_in_date="2030-01-01", check_out_date="2030-01-05")
+    client.post("/api/v1/reservations/bulk", json={"reservations": [sample_reservation_data, second], "mode": "partial"})
+    messages = db_session.scalars(select(OutboxMessage).order_by(OutboxMessage.id)).all()
+    assert [message.task_name for message in messages] == ["send_reservation_emails", "refresh_occupancy"]
+    assert len(messages[0].args[0]) == 2 and len(messages[1].args[0]) == 2
+
+def test_relay_publishes_in_batches_and_deletes(db_session, published):
+    _queue(db_session, 5)
+    assert outbox.relay_batch(db_session, batch_size=3) == 3
+    assert outbox.relay_batch(db_session, batch_size=3) == 2
+    assert outbox.relay_batch(db_session, batch_size=3) == 0
+    assert [args for _, args, _ in published] == [[{"n": n}] for n in range(5)]
+    assert len({task_id for _, _, task_id in published}) == 5
+    assert db_session.scalars(select(OutboxMessage)).all() == []
+
+def test_relays_skip_rows_claimed_by_another(db_session, published):
+    _queue(db_session, 2)
+    other_relay = Session(db_session.get_bind())
+    try:
+        claimed = other_relay.scalars(select(OutboxMessage).with_for_update(skip_locked=True)).all()
+        assert len(claimed) == 2
+        assert outbox.relay_batch(db_session) == 0
+        other_relay.rollback()
+        assert outbox.relay_batch(db_session) == 2
+    finally:
+        other_relay.close()
+
+def test_failed_publish_keeps_messages(db_session, monkeypatch):
+    _queue(db_session, 2)
+
+    def broker_down(*args, **kwargs):
+        raise ConnectionError("broker unreachable")
+
+    monkeypatch.setattr(outbox.celery_app, "send_task", broker_down)
+    with pytest.raises(ConnectionError):
+        outbox.relay_batch(db_session)
+    assert len(db_session.scalars(select(OutboxMessage)).all()) == 2
@@ -0,0 +1,46 @@
+import pytest
+from app import worker
+
+EMAIL = {
+    "to_email": "guest@example.com",
+    "subject": "Reservation Confirmation",
+    "template_name": "reservation_confirmation",
+    "context": {
+        "guest_name": "Guest",
+        "unit_name": "Cabin",
+        "check_in_date": "2024-01-01",
+        "check_out_date": "2024-01-03",
+        "reservation_id": 1,
+    },
+}
+
+@pytest.fixture
+def worker_process(smtp_sink, monkeypatch):
+    monkeypatch.setattr(worker.email_service, "smtp_host", "127.0.0.1")
+    monkeypatch.setattr(worker.email_service, "smtp_port", smtp_sink.port)
+    worker.start_worker_process()
+    yield smtp_sink
+    worker.stop_worker_process()
+
+def test_tasks_share_the_process_loop_and_smtp_sessions(worker_process):
+    loop = worker.get_event_loop()
+    assert worker.send_reservation_email_task.apply(args=[EMAIL]).get()["status"] == "success"
+    assert worker.send_reservation_emails_task.apply(args=[[EMAIL, EMAIL]]).get()["sent"] == 2
+    assert worker.send_reservation_email_task.apply(args=[EMAIL]).get()["status"] == "success"
+
+    assert worker.get_event_loop() is loop and not loop.is_closed()
+    assert len(worker_process.messages) == 4
+    # Only the concurrent batch needed a second session
+    assert len(worker_process.sessions) == 2
+
+def test_shutdown_closes_the_loop(worker_process):
+    loop = worker.get_event_loop()
+    worker.run_async(worker.email_service.send_email(**EMAIL))
+    worker.stop_worker_process()
+    assert loop.is_closed()
+    assert worker.email_service._pools.get(loop) is None
+    # A task arriving afterwards gets a fresh loop
+    assert worker.run_async(_answer()) == 42
+
+async def _answer():
+    return 42